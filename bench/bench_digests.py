@@ -0,0 +1,85 @@
+# Memory of a large column mapping and size of the anonymized SQL for each
+# digest encoding and length.
+#
+#   python -m bench.bench_digests [--columns 200000] [--queries 20000]
+import argparse
+import hashlib
+import sys
+import tracemalloc
+
+from bench.corpus import mixed_queries
+from sql_cache import column_hash_cache, query_fingerprint_cache
+from sql_hashing import ColumnMapping, column_digest, configure_digests
+from sql_parser import ParsedQuery
+
+SETTINGS = [("hex", None), ("base32", None), ("base64url", None), ("hex", 16), ("base32", 16)]
+
+
+def traced_size(build):
+    tracemalloc.start()
+    value = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return value, size
+
+
+def fresh_names(column_count):
+    # Every parse and every batch coming back from a worker brings its own
+    # copies of the column name strings
+    return [f"customer_attribute_{index}".encode().decode() for index in range(column_count)]
+
+
+def hex_strings(column_count):
+    # Before: hash cache and merged mapping each hold name and hex strings
+    hash_cache = {name: hashlib.sha256(name.encode()).hexdigest() for name in fresh_names(column_count)}
+    merged = {name: hash_cache[name][:] for name in fresh_names(column_count)}
+    return hash_cache, merged
+
+
+def raw_digests(column_count):
+    # Now: both hold raw digests and share the interned name strings
+    hash_cache = {}
+    for name in fresh_names(column_count):
+        hash_cache[sys.intern(name)] = column_digest(name)
+    merged = ColumnMapping()
+    for name in fresh_names(column_count):
+        merged.add(name, hash_cache[name])
+    return hash_cache, merged
+
+
+def mapping_memory(column_count):
+    column_hash_cache.clear()
+    _, hex_size = traced_size(lambda: hex_strings(column_count))
+    _, digest_size = traced_size(lambda: raw_digests(column_count))
+    print(f"{column_count} columns in the hash cache and the merged mapping: "
+          f"hex strings {hex_size / 2 ** 20:.1f} MiB, raw digests {digest_size / 2 ** 20:.1f} MiB "
+          f"({1 - digest_size / hex_size:.0%} less)")
+
+
+def output_size(queries, encoding, length):
+    configure_digests(encoding, length)
+    column_hash_cache.clear()
+    query_fingerprint_cache.clear()
+    return sum(len(ParsedQuery(sql_query).modified_sql) for sql_query in queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure mapping memory and output size per digest setting.")
+    parser.add_argument("--columns", type=int, default=200000)
+    parser.add_argument("--queries", type=int, default=20000)
+    args = parser.parse_args()
+
+    mapping_memory(args.columns)
+    queries = list(mixed_queries(args.queries))
+    input_size = sum(len(sql_query) for sql_query in queries)
+    baseline = None
+    print(f"{args.queries} queries, {input_size / 2 ** 20:.1f} MiB of input SQL")
+    for encoding, length in SETTINGS:
+        size = output_size(queries, encoding, length)
+        baseline = baseline or size
+        print(f"{encoding:<10} length={str(length or 'full'):<5} output {size / 2 ** 20:>6.1f} MiB "
+              f"({size / baseline:.0%} of hex)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+# Compare the fast_parse path with the sqlparse path on the simple-query
+# corpora: statement type plus column mapping, which is what
+# is_select_statement and hash_column_names need. The fingerprint cache is
+# off so every query is read from scratch.
+#
+#   python -m bench.bench_fast_lexer [--queries 5000] [--repeat 3] [--corpora simple dml joins]
+import argparse
+import time
+
+from bench.corpus import CORPORA
+from sql_cache import column_hash_cache
+from sql_parser import ParsedQuery
+
+
+def read_queries(queries, use_fast_path):
+    for sql_query in queries:
+        parsed_query = ParsedQuery(sql_query, use_cache=False, use_fast_path=use_fast_path)
+        parsed_query.statement_type
+        parsed_query.column_name_mapping
+
+
+def best_time(queries, use_fast_path, repeat):
+    # Minimum of several runs, the column hash cache is warm for all of them
+    read_queries(queries, use_fast_path)
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        read_queries(queries, use_fast_path)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the fast lexer with the sqlparse path.")
+    parser.add_argument("--queries", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--corpora", nargs="+", choices=sorted(CORPORA),
+                        default=["simple", "dml", "joins", "mixed"])
+    args = parser.parse_args()
+
+    for corpus_name in args.corpora:
+        queries = list(CORPORA[corpus_name](args.queries))
+        column_hash_cache.clear()
+        sqlparse_seconds = best_time(queries, False, args.repeat)
+        fast_seconds = best_time(queries, True, args.repeat)
+        print(f"{corpus_name:<10} sqlparse={len(queries) / sqlparse_seconds:>9.0f} q/s "
+              f"fast={len(queries) / fast_seconds:>9.0f} q/s "
+              f"speedup={sqlparse_seconds / fast_seconds:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+# Compare the anonymizer with and without the query fingerprint cache on a
+# templated workload: a few hundred statement shapes with changing literals.
+#
+#   python -m bench.bench_fingerprint_cache [--queries 20000] [--templates 200]
+import argparse
+import time
+
+from bench.corpus import templated_queries
+from sql_cache import query_fingerprint_cache
+from sql_parser import ParsedQuery
+
+
+def run(queries, use_cache):
+    query_fingerprint_cache.clear()
+    started = time.perf_counter()
+    for sql_query in queries:
+        ParsedQuery(sql_query, use_cache=use_cache).modified_sql
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure the query fingerprint cache on a templated workload.")
+    parser.add_argument("--queries", type=int, default=20000)
+    parser.add_argument("--templates", type=int, default=200)
+    args = parser.parse_args()
+
+    queries = list(templated_queries(args.queries, template_count=args.templates))
+    uncached = run(queries, use_cache=False)
+    cached = run(queries, use_cache=True)
+    stats = query_fingerprint_cache.stats()
+    print(f"{args.queries} queries over {args.templates} templates")
+    print(f"  without cache: {args.queries / uncached:>9.0f} queries/s")
+    print(f"  with cache:    {args.queries / cached:>9.0f} queries/s "
+          f"speedup={uncached / cached:.1f}x hit_rate={stats['hit_rate']:.1%}")
+
+
+if __name__ == "__main__":
+    main()
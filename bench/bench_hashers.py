@@ -0,0 +1,103 @@
+# Throughput of every hash backend on column names like the ones of real
+# queries: short snake_case names, a few long ones, qualified names, with a
+# skewed distribution. Also compares building a hash object per name with
+# copying a prebuilt one, which is what Hasher does.
+#
+#   python -m bench.bench_hashers [--names 200000] [--repeat 5]
+import argparse
+import hashlib
+import hmac
+import random
+import time
+
+from sql_hashing import Hasher
+
+KEY = b"benchmark-key-0123456789abcdef"
+
+BACKENDS = [
+    ("sha256", None, None),
+    ("blake2b", None, None),
+    ("blake2b", 16, None),
+    ("blake2s", None, None),
+    ("hmac-sha256", None, KEY),
+    ("blake2b-keyed", None, KEY),
+]
+
+_WORDS = ["id", "user", "name", "created", "updated", "at", "account", "order", "amount",
+          "status", "email", "address", "customer", "product", "price", "total", "count"]
+
+
+def column_names(count, seed=0):
+    # About 2000 distinct names, the popular ones seen far more often
+    generator = random.Random(seed)
+    vocabulary = []
+    for index in range(2000):
+        words = generator.sample(_WORDS, generator.choice([1, 2, 2, 3, 5]))
+        name = "_".join(words) + (f"_{index}" if generator.random() < 0.5 else "")
+        if generator.random() < 0.2:
+            name = f"t{generator.randrange(5)}.{name}"
+        vocabulary.append(name)
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+    return generator.choices(vocabulary, weights, k=count)
+
+
+def best_time(function, names, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for name in names:
+            function(name)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def constructor_per_name(algorithm, digest_size, key):
+    if algorithm == "sha256":
+        return lambda name: hashlib.sha256(name.encode()).digest()
+    if algorithm == "hmac-sha256":
+        return lambda name: hmac.new(key, name.encode(), hashlib.sha256).digest()
+    blake2 = hashlib.blake2s if algorithm == "blake2s" else hashlib.blake2b
+    return lambda name: blake2(name.encode(), digest_size=digest_size or 32,
+                               key=key or b"").digest()
+
+
+def copy_per_name(algorithm, digest_size, key):
+    if algorithm == "sha256":
+        prototype = hashlib.sha256()
+    elif algorithm == "hmac-sha256":
+        prototype = hmac.new(key, digestmod=hashlib.sha256)
+    else:
+        blake2 = hashlib.blake2s if algorithm == "blake2s" else hashlib.blake2b
+        prototype = blake2(digest_size=digest_size or 32, key=key or b"")
+
+    def digest(name):
+        hash_object = prototype.copy()
+        hash_object.update(name.encode())
+        return hash_object.digest()
+    return digest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the throughput of the hash backends.")
+    parser.add_argument("--names", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    names = column_names(args.names)
+    print(f"{args.names} column names, {len(set(names))} distinct, "
+          f"mean length {sum(map(len, names)) / len(names):.1f}")
+    print(f"{'backend':<16} {'Hasher':>12} {'new per name':>14} {'copy per name':>14}")
+    for algorithm, digest_size, key in BACKENDS:
+        label = algorithm + (f"/{digest_size}" if digest_size else "")
+        hasher = Hasher(algorithm, digest_size, key)
+        timings = [best_time(function, names, args.repeat) for function in (
+            hasher.digest,
+            constructor_per_name(algorithm, digest_size, key),
+            copy_per_name(algorithm, digest_size, key))]
+        print(f"{label:<16}" + "".join(
+            f"{args.names / seconds / 1e6:>10.2f} M/s" for seconds in timings))
+
+
+if __name__ == "__main__":
+    main()
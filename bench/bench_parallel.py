@@ -0,0 +1,47 @@
+# Measure throughput of the streaming anonymizer for different worker counts.
+#
+#   python -m bench.bench_parallel [--queries 100000] [--batch-size 500] [--workers 1 2 4 8]
+import argparse
+import os
+import time
+
+from bench.corpus import mixed_queries
+from bench.run_bench import reset_caches
+from sql_stream import anonymize_batches
+
+
+def build_corpus(query_count):
+    # Mix of the statement shapes we see in the query logs
+    for sql_query in mixed_queries(query_count):
+        yield {}, sql_query
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure anonymizer throughput for different numbers of worker processes.")
+    parser.add_argument("--queries", type=int, default=100000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--workers", type=int, nargs="+")
+    args = parser.parse_args()
+
+    cpu_count = os.cpu_count() or 1
+    worker_counts = args.workers or sorted({1, 2, 4, 8, cpu_count})
+    baseline = None
+    print(f"{args.queries} queries, {cpu_count} CPUs")
+    for workers in worker_counts:
+        # Forked workers inherit the caches of this process, every run starts them cold
+        reset_caches()
+        started = time.perf_counter()
+        count = 0
+        for _ in anonymize_batches(build_corpus(args.queries), batch_size=args.batch_size,
+                                   workers=workers):
+            count += 1
+        elapsed = time.perf_counter() - started
+        throughput = count / elapsed
+        baseline = baseline or throughput
+        print(f"workers={workers:>3}: {throughput:>9.0f} queries/s "
+              f"speedup={throughput / baseline:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
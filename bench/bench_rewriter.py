@@ -0,0 +1,59 @@
+# Compare the per-call regex rewrite with the reusable ColumnRewriter for
+# growing column mappings.
+#
+#   python -m bench.bench_rewriter [--sizes 10 1000 10000] [--repeat 200]
+import argparse
+import hashlib
+import re
+import time
+
+from sql_rewriter import ColumnRewriter
+
+
+def regex_modified_query(sql_query, column_name_mapping):
+    # The rewrite as it was: compile one alternation of every key per call
+    column_pattern = re.compile(r'\b(' + '|'.join(re.escape(key) for key in column_name_mapping.keys()) + r')\b')
+    return column_pattern.sub(lambda match: column_name_mapping[match.group(0)], sql_query)
+
+
+def build_mapping(size):
+    return {f"column_{index}": hashlib.sha256(f"column_{index}".encode()).hexdigest()
+            for index in range(size)}
+
+
+def build_query(size, column_count=200):
+    step = max(size // column_count, 1)
+    columns = ", ".join(f"column_{index}" for index in range(0, size, step))
+    return f"SELECT {columns} FROM report WHERE column_0 = 'column_1' AND other_value > 3"
+
+
+def timed(function, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - started) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare the per-call regex rewrite with ColumnRewriter.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        mapping = build_mapping(size)
+        sql_query = build_query(size)
+        rewriter = ColumnRewriter(mapping)
+        assert rewriter.rewrite(sql_query) == regex_modified_query(sql_query, mapping)
+        regex_time = timed(lambda: regex_modified_query(sql_query, mapping), args.repeat)
+        fresh_time = timed(lambda: ColumnRewriter(mapping).rewrite(sql_query), args.repeat)
+        reused_time = timed(lambda: rewriter.rewrite(sql_query), args.repeat)
+        print(f"mapping={size:>6}: regex={regex_time * 1000:8.3f} ms "
+              f"rewriter(new)={fresh_time * 1000:8.3f} ms "
+              f"rewriter(reused)={reused_time * 1000:8.3f} ms "
+              f"speedup={regex_time / reused_time:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
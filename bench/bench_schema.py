@@ -0,0 +1,74 @@
+# Compare discovering the columns of every query with the schema mode,
+# where the columns come from DDL hashed once up front. Times the column
+# mapping plus the rewrite of each query (hash_column_names and
+# modified_query), the part the schema replaces.
+#
+#   python -m bench.bench_schema [--queries 20000] [--corpus mixed nested]
+import argparse
+import os
+import tempfile
+import time
+
+from bench.corpus import CORPORA
+from sql_cache import column_hash_cache, query_fingerprint_cache
+from sql_parser import ParsedQuery
+from sql_schema import configure_schema
+
+
+def corpus_ddl(table_count=50, column_count=2000, join_count=4):
+    # CREATE TABLE statements holding every column name of bench.corpus
+    per_table = column_count // table_count
+    statements = []
+    for table in range(table_count):
+        columns = [f"col_{index} integer" for index in range(table * per_table, (table + 1) * per_table)]
+        columns += [f"id_{index} integer" for index in range(1, join_count + 1)]
+        statements.append(f"CREATE TABLE table_{table} (\n    " + ",\n    ".join(columns) +
+                          ",\n    PRIMARY KEY (id_1)\n);\n")
+    return "".join(statements)
+
+
+def anonymize(queries, use_cache=True, use_schema=False):
+    for sql_query in queries:
+        parsed_query = ParsedQuery(sql_query, use_cache=use_cache, use_schema=use_schema)
+        parsed_query.column_name_mapping
+        parsed_query.modified_sql
+
+
+def timed(queries, **kwargs):
+    column_hash_cache.clear()
+    query_fingerprint_cache.clear()
+    started = time.perf_counter()
+    anonymize(queries, **kwargs)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare column discovery with the schema mode.")
+    parser.add_argument("--queries", type=int, default=20000)
+    parser.add_argument("--corpus", nargs="+", default=["mixed", "nested"], choices=sorted(CORPORA))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "schema.sql")
+        with open(path, "w", encoding="utf-8") as ddl_file:
+            ddl_file.write(corpus_ddl())
+        started = time.perf_counter()
+        # The discovery runs below pass use_schema=False
+        schema = configure_schema(path)
+    print(f"schema: {len(schema.tables)} tables, {len(schema)} columns, "
+          f"loaded and hashed in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    for corpus in args.corpus:
+        queries = list(CORPORA[corpus](args.queries))
+        uncached = timed(queries, use_cache=False)
+        cached = timed(queries)
+        with_schema = timed(queries, use_schema=True)
+        print(f"{corpus}: {args.queries} queries")
+        print(f"  discovery, no fingerprint cache: {args.queries / uncached:>9.0f} queries/s")
+        print(f"  discovery, fingerprint cache:    {args.queries / cached:>9.0f} queries/s")
+        print(f"  schema:                          {args.queries / with_schema:>9.0f} queries/s "
+              f"({uncached / with_schema:.1f}x, {cached / with_schema:.1f}x)")
+    configure_schema()
+
+if __name__ == "__main__":
+    main()
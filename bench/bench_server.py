@@ -0,0 +1,85 @@
+# Load generator for the asyncio anonymization service.
+#
+# Starts `sql_parser.py --serve-port 0` in a subprocess, then opens one
+# connection per simulated client. Every client sends a query, waits for the
+# answer and sends the next one. Reports throughput and p50/p99/max latency
+# for each concurrency level.
+#
+#   python -m bench.bench_server [--requests 5000] [--concurrency 1 8 32 128]
+#                                [--max-batch-size 64] [--max-batch-latency-ms 5] [--workers 1]
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+from bench.corpus import mixed_queries
+from bench.run_bench import percentile
+
+SQL_PARSER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sql_parser.py")
+
+
+def start_server(args):
+    server = subprocess.Popen(
+        [sys.executable, SQL_PARSER, "--serve-port", "0",
+         "--max-batch-size", str(args.max_batch_size),
+         "--max-batch-latency-ms", str(args.max_batch_latency_ms),
+         "--workers", str(args.workers)],
+        stdout=subprocess.PIPE, text=True)
+    # "Anonymizer listening on ('127.0.0.1', 54321)"
+    address = server.stdout.readline().rsplit("(", 1)[1].rstrip(")\n")
+    host, port = address.split(", ")
+    return server, host.strip("'"), int(port)
+
+
+async def client(host, port, queries, latencies):
+    reader, writer = await asyncio.open_connection(host, port)
+    for sql_query in queries:
+        started = time.perf_counter()
+        writer.write(sql_query.encode() + b"\n")
+        await writer.drain()
+        await reader.readline()
+        latencies.append(time.perf_counter() - started)
+    writer.close()
+    await writer.wait_closed()
+
+
+async def run_level(host, port, queries, concurrency):
+    latencies = []
+    started = time.perf_counter()
+    await asyncio.gather(*[
+        client(host, port, queries[index::concurrency], latencies) for index in range(concurrency)])
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return len(latencies) / elapsed, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure throughput and tail latency of the anonymization service.")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 128])
+    parser.add_argument("--max-batch-size", type=int, default=64)
+    parser.add_argument("--max-batch-latency-ms", type=float, default=5.0)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+
+    queries = list(mixed_queries(args.requests))
+    server, host, port = start_server(args)
+    try:
+        print(f"{args.requests} requests, max batch {args.max_batch_size}, "
+              f"window {args.max_batch_latency_ms}ms, {args.workers} workers")
+        for concurrency in args.concurrency:
+            throughput, latencies = asyncio.run(run_level(host, port, queries, concurrency))
+            print(f"concurrency={concurrency:>4}: {throughput:>8.0f} requests/s "
+                  f"p50={percentile(latencies, 0.50) * 1000:.2f}ms "
+                  f"p99={percentile(latencies, 0.99) * 1000:.2f}ms "
+                  f"max={latencies[-1] * 1000:.2f}ms")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
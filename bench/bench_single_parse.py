@@ -0,0 +1,83 @@
+# Compare the old three-parse pipeline with the shared ParsedQuery object.
+#
+#   python -m bench.bench_single_parse [--queries N] [--columns N]
+import argparse
+import time
+from unittest import mock
+
+import sqlparse
+import sqlvalidator
+
+import sql_parser
+from bench.run_bench import reset_caches
+from sql_cache import configure_caches
+
+
+def build_query(column_count):
+    # Long generated SELECT similar to the ones produced by our reporting jobs
+    columns = ", ".join(f"column_{index}" for index in range(column_count))
+    conditions = " AND ".join(
+        f"column_{index} = 'value_{index}'" for index in range(0, column_count, 10))
+    return f"SELECT {columns} FROM report_table WHERE {conditions};"
+
+
+def old_pipeline(sql_query):
+    # The __main__ loop before ParsedQuery: every helper parses the query again
+    if sql_parser.is_select_statement(sql_query):
+        if not sql_parser.validate_sql_query(sql_query):
+            return None
+    column_name_mapping = sql_parser.hash_column_names(sql_query)
+    return sql_parser.modified_query(sql_query, column_name_mapping)
+
+
+def new_pipeline(sql_query):
+    parsed_query = sql_parser.ParsedQuery(sql_query)
+    if not parsed_query.is_processable:
+        return None
+    return parsed_query.modified_sql
+
+
+def run(pipeline, queries):
+    counts = {"sqlparse.parse": 0, "sqlvalidator.parse": 0}
+    original_sqlparse = sqlparse.parse
+    original_sqlvalidator = sqlvalidator.parse
+
+    def counting_sqlparse(*args, **kwargs):
+        counts["sqlparse.parse"] += 1
+        return original_sqlparse(*args, **kwargs)
+
+    def counting_sqlvalidator(*args, **kwargs):
+        counts["sqlvalidator.parse"] += 1
+        return original_sqlvalidator(*args, **kwargs)
+
+    with mock.patch.object(sqlparse, "parse", counting_sqlparse), \
+            mock.patch.object(sqlvalidator, "parse", counting_sqlvalidator):
+        started = time.perf_counter()
+        for sql_query in queries:
+            pipeline(sql_query)
+        elapsed = time.perf_counter() - started
+    return counts, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare parse counts and wall time of the old and the shared-parse pipeline.")
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--columns", type=int, default=200)
+    args = parser.parse_args()
+
+    queries = [build_query(args.columns)] * args.queries
+    # The queries are all the same: without this "after" would measure the
+    # fingerprint and validation caches, not the shared parse
+    configure_caches(fingerprint_cache_size=0, validation_cache_size=0)
+    for name, pipeline in (("before", old_pipeline), ("after", new_pipeline)):
+        # Neither run may reuse the column hashes of the other
+        reset_caches()
+        counts, elapsed = run(pipeline, queries)
+        print(f"{name:>6}: sqlparse.parse={counts['sqlparse.parse']:>5} "
+              f"sqlvalidator.parse={counts['sqlvalidator.parse']:>5} "
+              f"wall={elapsed:.3f}s ({elapsed / len(queries) * 1000:.2f} ms/query)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# Peak RSS and throughput of splitting a large SQL dump into statements:
+# the whole file read into one string, chunked reads, and the memory map
+# used for --input files. Each mode runs in its own process so ru_maxrss
+# only covers that mode.
+#
+#   python -m bench.bench_splitter [--size-mb 256] [--largest-kb 512]
+import argparse
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODES = {
+    "baseline": "statements = []",
+    "read": "statements = split_sql_statements([open(path, encoding='utf-8').read()])",
+    "chunks": "statements = split_sql_statements(read_chunks(open(path, encoding='utf-8')))",
+    "mmap": "statements = split_sql_file(open(path, 'rb'))",
+}
+
+_SCRIPT = """
+import resource, sys, time
+from sql_splitter import split_sql_file, split_sql_statements
+from sql_stream import read_chunks
+path = sys.argv[1]
+started = time.perf_counter()
+{mode}
+count = largest = 0
+for statement in statements:
+    count += 1
+    largest = max(largest, len(statement))
+print(count, largest, time.perf_counter() - started, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+
+def write_dump(path, size, largest_size, seed=0):
+    # Dump-like content: comment headers, CREATE TABLE, a function with a
+    # dollar-quoted body, many small INSERTs and a few multi-row ones
+    generator = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as dump:
+        written = 0
+        table = 0
+        while written < size:
+            table += 1
+            parts = [
+                f"--\n-- Name: table_{table}; Type: TABLE; Schema: public\n--\n",
+                f"CREATE TABLE table_{table} (id integer, name text, note text);\n",
+                f"CREATE FUNCTION touch_{table}() RETURNS trigger AS $body$\n"
+                f"BEGIN NEW.note := 'touched; again'; RETURN NEW; END;\n$body$ LANGUAGE plpgsql;\n",
+            ]
+            for row in range(200):
+                parts.append(f"INSERT INTO table_{table} (id, name, note) VALUES "
+                             f"({row}, 'name_{generator.randrange(10 ** 6)}', 'it''s; fine');\n")
+            if table % 50 == 0:
+                rows = []
+                length = 0
+                while length < largest_size:
+                    row = f"({len(rows)}, 'bulk_{generator.randrange(10 ** 6)}', 'x; y')"
+                    rows.append(row)
+                    length += len(row) + 2
+                parts.append(f"INSERT INTO table_{table} VALUES {', '.join(rows)};\n")
+            chunk = "".join(parts)
+            dump.write(chunk)
+            written += len(chunk)
+
+
+def run_mode(mode, path):
+    completed = subprocess.run(
+        [sys.executable, "-c", _SCRIPT.format(mode=MODES[mode]), path],
+        cwd=REPO_DIR, capture_output=True, text=True, check=True)
+    count, largest, seconds, max_rss_kb = completed.stdout.split()
+    return int(count), int(largest), float(seconds), int(max_rss_kb) / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the memory use of the statement splitters.")
+    parser.add_argument("--size-mb", type=float, default=256)
+    parser.add_argument("--largest-kb", type=float, default=512)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "dump.sql")
+        write_dump(path, int(args.size_mb * 2 ** 20), int(args.largest_kb * 1024))
+        size_mb = os.path.getsize(path) / 2 ** 20
+        print(f"{size_mb:.0f} MiB dump")
+        for mode in MODES:
+            count, largest, seconds, max_rss_mb = run_mode(mode, path)
+            if mode == "baseline":
+                print(f"{'interpreter':<8} peak RSS {max_rss_mb:>7.1f} MiB")
+                continue
+            print(f"{mode:<8} peak RSS {max_rss_mb:>7.1f} MiB, {count} statements "
+                  f"(largest {largest / 1024:.0f} KiB), {size_mb / seconds:.0f} MiB/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# Check the import-time budget of sql_parser and compare one process per
+# query with the warm --serve-stdin mode.
+#
+#   python -m bench.bench_startup [--budget-ms 50] [--runs 5] [--queries 50]
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SQL_PARSER = os.path.join(REPO_DIR, "sql_parser.py")
+# Modules that have to stay out of the import of sql_parser
+LAZY_MODULES = ("sqlparse", "sqlvalidator", "argparse", "multiprocessing", "cProfile", "tracemalloc",
+                "base64", "hmac", "mmap", "sql_schema", "sql_splitter", "sql_mapping_store")
+_IMPORT_TIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def _bytecode_env():
+    # An installed package imports from .pyc files. With
+    # PYTHONDONTWRITEBYTECODE set every run would compile the sources again
+    # and time the compiler instead of the imports.
+    env = dict(os.environ)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    return env
+
+
+def import_times():
+    # Parse the output of python -X importtime: module -> cumulative microseconds
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import sql_parser"],
+        cwd=REPO_DIR, capture_output=True, text=True, check=True, env=_bytecode_env())
+    times = {}
+    for line in completed.stderr.splitlines():
+        match = _IMPORT_TIME_LINE.match(line)
+        if match:
+            times[match.group(4)] = int(match.group(2))
+    return times
+
+
+def cold_query_seconds(sql_query):
+    # A short-lived job: start the interpreter, import, anonymize one query
+    started = time.perf_counter()
+    subprocess.run([sys.executable, SQL_PARSER, "--input", "-"], cwd=REPO_DIR,
+                   input=sql_query, capture_output=True, text=True, check=True)
+    return time.perf_counter() - started
+
+
+def warm_query_seconds(sql_queries):
+    # One --serve-stdin process answering every query in turn
+    process = subprocess.Popen([sys.executable, SQL_PARSER, "--serve-stdin"], cwd=REPO_DIR,
+                               stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    latencies = []
+    try:
+        for sql_query in sql_queries:
+            started = time.perf_counter()
+            process.stdin.write(sql_query + "\n")
+            process.stdin.flush()
+            process.stdout.readline()
+            latencies.append(time.perf_counter() - started)
+    finally:
+        process.stdin.close()
+        process.wait()
+    # The first answer pays for starting the process
+    return latencies[0], statistics.median(latencies[1:]) if len(latencies) > 1 else latencies[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the startup-time budget of sql_parser.")
+    parser.add_argument("--budget-ms", type=float, default=50.0,
+                        help="maximum cumulative import time of sql_parser")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+
+    # The first run writes the .pyc files
+    import_times()
+    runs = [import_times() for _ in range(args.runs)]
+    import_ms = statistics.median(times["sql_parser"] for times in runs) / 1000
+    eager = sorted({name for times in runs for name in times
+                    if name.split(".")[0] in LAZY_MODULES})
+    print(f"import sql_parser: {import_ms:.1f} ms (budget {args.budget_ms:.1f} ms)")
+    print(f"lazy modules imported at startup: {', '.join(eager) or 'none'}")
+
+    sql_query = "SELECT name, age FROM user WHERE age > 18"
+    cold = statistics.median(cold_query_seconds(sql_query) for _ in range(args.runs))
+    first, warm = warm_query_seconds([sql_query] * args.queries)
+    print(f"one process per query: {cold * 1000:.1f} ms per query")
+    print(f"--serve-stdin:         {first * 1000:.1f} ms first query, {warm * 1000:.2f} ms after")
+
+    if import_ms > args.budget_ms or eager:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+# Compare the regex rewrite of the query text with the token rewrite that
+# reuses the sqlparse tree, on large queries.
+#
+#   python -m bench.bench_token_rewrite [--columns 100 1000 5000] [--repeat 20]
+import argparse
+import time
+
+from sql_parser import ParsedQuery, modified_query
+from sql_rewriter import rewrite_statements
+
+
+def build_query(column_count):
+    columns = ", ".join(f"t.column_{index}" for index in range(column_count))
+    conditions = " AND ".join(
+        f"column_{index} = 'column_{index}'" for index in range(0, column_count, 5))
+    return f"SELECT {columns} FROM report t WHERE {conditions}"
+
+
+def timed(function, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - started) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare the regex rewrite with the parse-tree token rewrite.")
+    parser.add_argument("--columns", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    for column_count in args.columns:
+        sql_query = build_query(column_count)
+        parsed_query = ParsedQuery(sql_query, use_cache=False)
+        statements = parsed_query.statements
+        column_name_mapping = parsed_query.column_name_mapping
+        regex_time = timed(lambda: modified_query(sql_query, column_name_mapping), args.repeat)
+        token_time = timed(lambda: rewrite_statements(statements, column_name_mapping), args.repeat)
+        # The token rewrite leaves the string literals alone, the regex rewrite does not
+        leaked = modified_query(sql_query, column_name_mapping).count("'column_")
+        print(f"columns={column_count:>5}: regex={regex_time * 1000:8.2f} ms "
+              f"tokens={token_time * 1000:8.2f} ms "
+              f"ratio={token_time / regex_time:5.2f} "
+              f"literals rewritten by regex={column_count // 5 - leaked}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+# Synthetic query corpora for the benchmarks.
+#
+# Every generator is deterministic for a given seed, so results of two runs
+# can be compared. The corpus can also be written to a file to benchmark the
+# command line:
+#
+#   python -m bench.corpus --kind mixed --count 100000 --output corpus.sql
+import argparse
+import json
+import random
+
+
+def _column(generator, prefix="col"):
+    return f"{prefix}_{generator.randrange(2000)}"
+
+
+def _literal(generator):
+    if generator.random() < 0.5:
+        return str(generator.randrange(10 ** 6))
+    return f"'value_{generator.randrange(10 ** 6)}'"
+
+
+def _conditions(generator, count, prefix="col"):
+    operators = ["=", ">", "<", "<>", ">="]
+    return " AND ".join(
+        f"{_column(generator, prefix)} {generator.choice(operators)} {_literal(generator)}"
+        for _ in range(count))
+
+
+def simple_queries(count, seed=0):
+    # Single-table SELECT with a few columns and conditions
+    generator = random.Random(seed)
+    for _ in range(count):
+        columns = ", ".join(_column(generator) for _ in range(generator.randint(1, 6)))
+        yield (f"SELECT {columns} FROM table_{generator.randrange(50)} "
+               f"WHERE {_conditions(generator, generator.randint(1, 3))}")
+
+
+def wide_queries(count, seed=0, column_count=300):
+    # SELECT with hundreds of columns
+    generator = random.Random(seed)
+    for _ in range(count):
+        columns = ", ".join(_column(generator) for _ in range(column_count))
+        yield f"SELECT {columns} FROM wide_table WHERE {_conditions(generator, 5)}"
+
+
+def join_queries(count, seed=0, join_count=4):
+    # SELECT over several joined tables with qualified columns
+    generator = random.Random(seed)
+    join_types = ["INNER JOIN", "LEFT JOIN", "RIGHT JOIN", "FULL OUTER JOIN"]
+    for _ in range(count):
+        tables = [f"t{index}" for index in range(join_count + 1)]
+        columns = ", ".join(
+            f"{generator.choice(tables)}.{_column(generator)}" for _ in range(8))
+        joins = " ".join(
+            f"{generator.choice(join_types)} table_{index} {tables[index]} "
+            f"ON {tables[index - 1]}.id_{index} = {tables[index]}.id_{index}"
+            for index in range(1, join_count + 1))
+        yield (f"SELECT {columns} FROM table_0 t0 {joins} "
+               f"WHERE {_conditions(generator, 2, 't0.col')} ORDER BY t0.col_1")
+
+
+def dml_queries(count, seed=0):
+    # INSERT, UPDATE and DELETE statements
+    generator = random.Random(seed)
+    for index in range(count):
+        kind = index % 3
+        if kind == 0:
+            columns = [_column(generator) for _ in range(generator.randint(2, 8))]
+            values = ", ".join(_literal(generator) for _ in columns)
+            yield f"INSERT INTO table_{generator.randrange(50)} ({', '.join(columns)}) VALUES ({values})"
+        elif kind == 1:
+            assignments = ", ".join(
+                f"{_column(generator)} = {_literal(generator)}" for _ in range(generator.randint(1, 5)))
+            yield (f"UPDATE table_{generator.randrange(50)} SET {assignments} "
+                   f"WHERE {_conditions(generator, 2)}")
+        else:
+            yield f"DELETE FROM table_{generator.randrange(50)} WHERE {_conditions(generator, 2)}"
+
+
+def nested_queries(count, seed=0, depth=6):
+    # Subqueries nested depth levels deep in WHERE ... IN (...)
+    generator = random.Random(seed)
+    for _ in range(count):
+        sql_query = f"SELECT {_column(generator)} FROM table_{depth} WHERE {_conditions(generator, 1)}"
+        for level in range(depth - 1, -1, -1):
+            sql_query = (f"SELECT {_column(generator)}, {_column(generator)} FROM table_{level} "
+                         f"WHERE {_column(generator)} IN ({sql_query}) AND {_conditions(generator, 1)}")
+        yield sql_query
+
+
+def templated_queries(count, seed=0, template_count=200):
+    # The same few hundred statement shapes with different literals
+    generator = random.Random(seed)
+    templates = []
+    for _ in range(template_count):
+        columns = ", ".join(_column(generator) for _ in range(8))
+        filters = [_column(generator) for _ in range(3)]
+        templates.append(
+            f"SELECT {columns} FROM table_{generator.randrange(50)} "
+            f"WHERE {filters[0]} = '{{0}}' AND {filters[1]} > {{1}} AND {filters[2]} IN ({{1}}, {{2}})")
+    for _ in range(count):
+        yield generator.choice(templates).format(
+            f"user{generator.randrange(10 ** 6)}", generator.randrange(100), generator.randrange(100))
+
+
+CORPORA = {
+    "simple": simple_queries,
+    "wide": wide_queries,
+    "joins": join_queries,
+    "dml": dml_queries,
+    "nested": nested_queries,
+    "templated": templated_queries,
+}
+
+
+def mixed_queries(count, seed=0):
+    # Round-robin over the simple, join, DML and templated corpora
+    kinds = ["simple", "joins", "dml", "templated"]
+    generators = [CORPORA[kind](count, seed) for kind in kinds]
+    for index in range(count):
+        yield next(generators[index % len(generators)])
+
+
+CORPORA["mixed"] = mixed_queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic query corpus.")
+    parser.add_argument("--kind", choices=sorted(CORPORA), default="mixed")
+    parser.add_argument("--count", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--format", choices=["sql", "jsonl"], default="sql")
+    parser.add_argument("--output", required=True)
+    args = parser.parse_args()
+
+    with open(args.output, "w", encoding="utf-8") as output:
+        for index, sql_query in enumerate(CORPORA[args.kind](args.count, args.seed)):
+            if args.format == "jsonl":
+                output.write(json.dumps({"request_id": f"q-{index}", "query": sql_query}) + "\n")
+            else:
+                output.write(sql_query + ";\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+# Benchmark suite for the SQL anonymizer.
+#
+# Times is_select_statement, validate_sql_query, hash_column_names and
+# modified_query separately and the whole pipeline end to end, on every
+# synthetic corpus. Reports queries/sec, p50/p99 latency and peak traced
+# memory, and writes the results as JSON so two runs can be compared:
+#
+#   python -m bench.run_bench --count 200 --output before.json
+#   python -m bench.run_bench --count 200 --output after.json --compare before.json
+import argparse
+import json
+import platform
+import time
+import tracemalloc
+
+from bench.corpus import CORPORA
+from sql_cache import column_hash_cache, query_fingerprint_cache, validation_cache
+from sql_parser import (ParsedQuery, hash_column_names, is_select_statement, modified_query,
+                        validate_sql_query)
+
+
+def end_to_end(sql_query):
+    # Same steps as the interactive loop and the streaming mode
+    parsed_query = ParsedQuery(sql_query)
+    if parsed_query.is_processable:
+        return parsed_query.modified_sql
+    return None
+
+
+STAGES = {
+    "is_select_statement": lambda sql_query, column_name_mapping: is_select_statement(sql_query),
+    "validate_sql_query": lambda sql_query, column_name_mapping: validate_sql_query(sql_query),
+    "hash_column_names": lambda sql_query, column_name_mapping: hash_column_names(sql_query),
+    "modified_query": lambda sql_query, column_name_mapping: modified_query(sql_query, column_name_mapping),
+    "end_to_end": lambda sql_query, column_name_mapping: end_to_end(sql_query),
+}
+
+
+def reset_caches():
+    # Every stage starts cold so the stages do not warm each other up
+    column_hash_cache.clear()
+    query_fingerprint_cache.clear()
+    validation_cache.clear()
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(int(round(fraction * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def run_stage(stage, queries, mappings):
+    reset_caches()
+    latencies = []
+    started = time.perf_counter()
+    for sql_query, column_name_mapping in zip(queries, mappings):
+        query_started = time.perf_counter()
+        stage(sql_query, column_name_mapping)
+        latencies.append(time.perf_counter() - query_started)
+    elapsed = time.perf_counter() - started
+
+    # Memory is traced in a separate pass, tracemalloc slows the timed one down
+    reset_caches()
+    tracemalloc.start()
+    for sql_query, column_name_mapping in zip(queries, mappings):
+        stage(sql_query, column_name_mapping)
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        "queries": len(queries),
+        "seconds": elapsed,
+        "queries_per_second": len(queries) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "peak_memory_bytes": peak_memory,
+    }
+
+
+def run_suite(corpora, stages, count, seed):
+    results = {}
+    for corpus_name in corpora:
+        queries = list(CORPORA[corpus_name](count, seed))
+        # modified_query is timed on its own, so its mappings are built beforehand
+        reset_caches()
+        mappings = [ParsedQuery(sql_query, use_cache=False).column_name_mapping for sql_query in queries]
+        results[corpus_name] = {
+            stage_name: run_stage(STAGES[stage_name], queries, mappings) for stage_name in stages
+        }
+    return results
+
+
+def print_results(results, previous=None):
+    print(f"{'corpus':<10} {'stage':<20} {'q/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'peak KiB':>10}"
+          + ("  vs previous" if previous else ""))
+    for corpus_name, stages in results.items():
+        for stage_name, result in stages.items():
+            line = (f"{corpus_name:<10} {stage_name:<20} {result['queries_per_second']:>10.0f} "
+                    f"{result['p50_ms']:>9.3f} {result['p99_ms']:>9.3f} "
+                    f"{result['peak_memory_bytes'] / 1024:>10.0f}")
+            before = (previous or {}).get(corpus_name, {}).get(stage_name)
+            if before and before["queries_per_second"]:
+                change = result["queries_per_second"] / before["queries_per_second"] - 1
+                line += f"  {change:+7.1%}"
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the SQL anonymizer benchmark suite.")
+    parser.add_argument("--corpora", nargs="+", choices=sorted(CORPORA),
+                        default=["simple", "wide", "joins", "dml", "nested", "templated"])
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), default=list(STAGES))
+    parser.add_argument("--count", type=int, default=200, help="queries per corpus")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare against")
+    args = parser.parse_args()
+
+    results = run_suite(args.corpora, args.stages, args.count, args.seed)
+    previous = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as previous_file:
+            previous = json.load(previous_file)["results"]
+    print_results(results, previous)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            json.dump({
+                "python": platform.python_version(),
+                "count": args.count,
+                "seed": args.seed,
+                "results": results,
+            }, output, indent=4)
+
+
+if __name__ == "__main__":
+    main()
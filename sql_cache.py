@@ -0,0 +1,151 @@
+import json
+import re
+from collections import OrderedDict
+
+
+DEFAULT_COLUMN_HASH_CACHE_SIZE = 100000
+DEFAULT_QUERY_FINGERPRINT_CACHE_SIZE = 10000
+DEFAULT_VALIDATION_CACHE_SIZE = 10000
+
+# String literals, text kept as it is (quoted identifiers, comments and
+# names), numeric literals and runs of whitespace. Quotes follow sqlparse's
+# rules, where a backslash-escaped quote does not end the literal. Names are
+# matched whole, with the '$', '#' and '@' sqlparse allows in them, so their
+# digits are never taken for numbers. A line comment keeps its newline,
+# which is where the SQL after it starts again.
+_FINGERPRINT_PATTERN = re.compile(
+    r"""('(?:''|\\'|[^'])*')"""
+    r'''|("(?:""|\\"|[^"])*"|`[^`]*`|\[[^\]]*\]|(?:--|# )[^\n]*\n?|/\*.*?(?:\*/|\Z)'''
+    r"|(?:[^\W\d]|[$#@])[\w$#@]*)"
+    r"|((?<![\w.$#@])[-+]?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?(?![\w.$#@]))"
+    r"|(\s+)", re.DOTALL)
+
+
+class LRUCache:
+    # Bounded mapping with least-recently-used eviction and hit/miss counters.
+    # A maxsize of None means unbounded, 0 disables the cache.
+
+    def __init__(self, maxsize=None):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        if self.maxsize == 0:
+            return
+        self._data[key] = value
+        self._data.move_to_end(key)
+        self._evict()
+
+    def resize(self, maxsize):
+        self.maxsize = maxsize
+        self._evict()
+
+    def clear(self):
+        self._data.clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _evict(self):
+        if self.maxsize is None:
+            return
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+
+# Process-wide cache of original column name -> raw digest of the name
+column_hash_cache = LRUCache(DEFAULT_COLUMN_HASH_CACHE_SIZE)
+
+# Process-wide cache of query fingerprint -> (statement type, column mapping,
+# ColumnRewriter of the mapping)
+query_fingerprint_cache = LRUCache(DEFAULT_QUERY_FINGERPRINT_CACHE_SIZE)
+
+# Process-wide cache of query text -> result of the SELECT validation
+validation_cache = LRUCache(DEFAULT_VALIDATION_CACHE_SIZE)
+
+
+def _fingerprint_token(match):
+    if match.group(2) is not None:
+        # Quoted identifiers can be column names, and a quote or digit in
+        # a comment must not turn the SQL after it into a literal
+        return match.group(2)
+    if match.group(4) is not None:
+        return ' '
+    return '?'
+
+
+def query_fingerprint(sql_query):
+    # Queries that only differ in their literals share the same fingerprint,
+    # e.g. "SELECT a FROM t WHERE b = 'x'" and "SELECT a FROM t WHERE b = 'y'"
+    return _FINGERPRINT_PATTERN.sub(_fingerprint_token, sql_query).strip()
+
+
+def configure_column_hash_cache(maxsize):
+    column_hash_cache.resize(maxsize)
+
+
+def configure_query_fingerprint_cache(maxsize):
+    query_fingerprint_cache.resize(maxsize)
+
+
+def configure_validation_cache(maxsize):
+    validation_cache.resize(maxsize)
+
+
+def preload_column_hash_cache(mapping_path):
+    # Warm the cache from a mapping file written with --mapping-output.
+    # Only full-length hashed names in the current encoding can be turned
+    # back into digests, the others are skipped.
+    from sql_hashing import decode_digest
+
+    with open(mapping_path, 'r', encoding='utf-8') as mapping_file:
+        column_name_mapping = json.load(mapping_file)
+    loaded = 0
+    for original_column_name, hashed_column_name in column_name_mapping.items():
+        digest = decode_digest(hashed_column_name)
+        if digest is not None:
+            column_hash_cache.put(original_column_name, digest)
+            loaded += 1
+    return loaded
+
+
+def configure_caches(hash_cache_size=DEFAULT_COLUMN_HASH_CACHE_SIZE,
+                     fingerprint_cache_size=DEFAULT_QUERY_FINGERPRINT_CACHE_SIZE,
+                     preload_mapping=None, validation_cache_size=DEFAULT_VALIDATION_CACHE_SIZE):
+    # Used by the command line and as the initializer of worker processes
+    configure_column_hash_cache(hash_cache_size)
+    configure_query_fingerprint_cache(fingerprint_cache_size)
+    configure_validation_cache(validation_cache_size)
+    if preload_mapping:
+        preload_column_hash_cache(preload_mapping)
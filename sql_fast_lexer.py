@@ -0,0 +1,247 @@
+import re
+
+from sql_lazy import lazy_import
+
+# Only needed to tell keywords from names, the way sqlparse's lexer does
+sqlparse = lazy_import('sqlparse')
+
+
+# One alternative per token kind, the last one catches everything the fast
+# path does not understand (comments, quoted identifiers, placeholders, ...)
+_TOKEN = re.compile(r"""
+    (\s+)
+  | ('(?:[^'\\]|'')*')
+  | (\d+(?:\.\d+)?(?:[eE]-?\d+)?(?![\w.]))
+  | ([A-Za-z_]\w*)\.([A-Za-z_]\w*)(?![\w.])
+  | ([A-Za-z_]\w*)(?![\w.])
+  | (<>|!=|<=|>=|=|<|>|\+|-(?!-)|/(?!\*))
+  | (,)
+  | (\()
+  | (\))
+  | (;\s*\Z)
+  | (.)
+""", re.VERBOSE | re.DOTALL)
+
+(_WHITESPACE, _STRING, _NUMBER, _QUALIFIER, _QUALIFIED_NAME, _WORD, _OPERATOR, _COMMA,
+ _OPEN, _CLOSE, _END, _OTHER) = range(1, 13)
+# Token kinds the tokenizer adds for words and '*'
+_NAME, _TABLE_KEYWORD, _STAR = range(13, 16)
+
+_STATEMENT_TYPES = frozenset(['SELECT', 'INSERT', 'UPDATE', 'DELETE'])
+
+# The JOIN forms flag_controller turns processing off for
+_JOIN_WORDS = frozenset(['INNER', 'LEFT', 'RIGHT', 'FULL', 'OUTER', 'CROSS', 'JOIN'])
+_JOIN_KEYWORDS = frozenset([
+    'JOIN', 'INNER JOIN', 'LEFT JOIN', 'RIGHT JOIN', 'FULL JOIN', 'CROSS JOIN',
+    'LEFT OUTER JOIN', 'RIGHT OUTER JOIN', 'FULL OUTER JOIN',
+])
+
+# Keywords that never change which tokens hold column names
+_NEUTRAL_KEYWORDS = frozenset(['AND', 'OR', 'NOT', 'IS', 'LIKE', 'ORDER', 'GROUP', 'BY', 'LIMIT'])
+
+_STRUCTURAL_KEYWORDS = (_STATEMENT_TYPES | _JOIN_WORDS | _NEUTRAL_KEYWORDS | frozenset([
+    'FROM', 'WHERE', 'SET', 'ON', 'INTO', 'VALUES', 'IN', 'NULL', 'ASC', 'DESC']))
+
+# Words sqlparse's lexer turns into keywords by their own rule instead of
+# its keyword dictionaries, usually together with the following word
+_LEXER_RULE_WORDS = frozenset([
+    'CASE', 'USING', 'AS', 'END', 'IF', 'NULLS', 'UNION', 'CREATE', 'DOUBLE', 'PRIMARY',
+    'HANDLER', 'GO', 'LATERAL', 'AT', 'WITH', 'ILIKE', 'RLIKE', 'REGEXP', 'STRAIGHT', 'NATURAL',
+])
+
+# Words a qualified name cannot use, sqlparse reads them as keywords even there
+_QUALIFIED_KEYWORDS = frozenset(['CASE', 'IN', 'VALUES', 'USING', 'FROM', 'AS'])
+
+# Upper-cased word -> _NAME, _TABLE_KEYWORD or None, filled in as words are seen
+_WORD_KINDS = {}
+_WORD_KINDS_LIMIT = 100000
+
+
+def _word_kind(upper):
+    try:
+        return _WORD_KINDS[upper]
+    except KeyError:
+        if len(_WORD_KINDS) >= _WORD_KINDS_LIMIT:
+            _WORD_KINDS.clear()
+        ttype = sqlparse.lexer.Lexer.get_default_instance().is_keyword(upper)[0]
+        kind = None
+        if upper in _LEXER_RULE_WORDS:
+            pass
+        elif ttype is sqlparse.tokens.Name:
+            kind = _NAME
+        elif ttype is sqlparse.tokens.Keyword or ttype is sqlparse.tokens.Name.Builtin:
+            # Harmless where table names are expected, e.g. "FROM user"
+            kind = _TABLE_KEYWORD
+        _WORD_KINDS[upper] = kind
+        return kind
+
+
+def _tokenize(sql_query):
+    # (kind, text) of every token but whitespace, None if any token is not understood
+    tokens = []
+    for match in _TOKEN.finditer(sql_query):
+        kind = match.lastindex
+        if kind == _WHITESPACE or kind == _END:
+            continue
+        if kind == _QUALIFIED_NAME:
+            if (match.group(_QUALIFIER).upper() in _QUALIFIED_KEYWORDS
+                    or match.group(_QUALIFIED_NAME).upper() in _QUALIFIED_KEYWORDS):
+                return None
+            tokens.append((_QUALIFIED_NAME, match.group(_QUALIFIED_NAME)))
+        elif kind == _WORD:
+            word = match.group(_WORD)
+            upper = word.upper()
+            if upper in _STRUCTURAL_KEYWORDS:
+                tokens.append((_WORD, upper))
+                continue
+            word_kind = _word_kind(upper)
+            if word_kind is None:
+                return None
+            tokens.append((word_kind, word))
+        elif kind == _OTHER:
+            if match.group(kind) != '*':
+                return None
+            tokens.append((_STAR, '*'))
+        else:
+            tokens.append((kind, match.group(kind)))
+    return tokens
+
+
+def fast_parse(sql_query):
+    # Statement type and column names, in order, of a simple single
+    # statement: SELECT, INSERT, UPDATE or DELETE with plain or qualified
+    # column names, literals, comparisons, AND/OR, JOIN ... ON, ORDER BY,
+    # GROUP BY and LIMIT. Returns None for anything else (functions,
+    # subqueries, aliases, comments, ...); the caller then uses sqlparse.
+    # Column names are found exactly like parse_statement finds them.
+    tokens = _tokenize(sql_query)
+    if not tokens or tokens[0][0] != _WORD or tokens[0][1] not in _STATEMENT_TYPES:
+        return None
+    statement_type = tokens[0][1]
+    process = statement_type != 'UPDATE'
+    column_names = []
+    previous = _WORD
+    index = 1
+    count = len(tokens)
+    while index < count:
+        kind, text = tokens[index]
+        index += 1
+        if kind == _WORD:
+            if text in _STATEMENT_TYPES:
+                # Second statement, subquery or INSERT ... SELECT
+                return None
+            if text in _JOIN_WORDS:
+                words = [text]
+                while text != 'JOIN' and index < count and tokens[index][0] == _WORD:
+                    text = tokens[index][1]
+                    words.append(text)
+                    index += 1
+                if ' '.join(words) not in _JOIN_KEYWORDS:
+                    return None
+                process = False
+            elif text == 'FROM':
+                process = False
+            elif text in ('WHERE', 'ON'):
+                process = True
+            elif text == 'SET':
+                if statement_type != 'UPDATE':
+                    return None
+                process = True
+            elif text == 'INTO':
+                if statement_type != 'INSERT' or index != 2:
+                    return None
+            elif text in ('VALUES', 'IN'):
+                if text == 'VALUES' and statement_type != 'INSERT':
+                    return None
+                # Lists of literals only, e.g. "VALUES (1, 'a'), (2, 'b')" or "IN (1, 2)"
+                while True:
+                    index = _skip_literal_list(tokens, index)
+                    if index is None:
+                        return None
+                    if text == 'IN' or index >= count or tokens[index][0] != _COMMA:
+                        break
+                    index += 1
+                previous = _STRING
+                continue
+            elif text == 'NULL':
+                if process and previous == _STRING:
+                    return None
+                previous = _STRING
+                continue
+            elif text in ('ASC', 'DESC'):
+                if previous != _STRING:
+                    return None
+                continue
+            previous = _WORD
+            continue
+        if kind in (_NAME, _QUALIFIED_NAME, _NUMBER, _STRING, _TABLE_KEYWORD, _STAR):
+            if process:
+                if previous not in (_WORD, _OPERATOR, _COMMA) or kind == _TABLE_KEYWORD:
+                    # Alias, or a keyword sqlparse might group differently
+                    return None
+                if kind == _STAR and not (previous == _COMMA or tokens[index - 2] == (_WORD, 'SELECT')):
+                    return None
+            if index < count and tokens[index][0] == _OPEN:
+                if not (statement_type == 'INSERT' and index == 3 and kind == _NAME):
+                    # Function call
+                    return None
+                # "INSERT INTO table (columns)": the table is not a column
+                index = _read_name_list(tokens, index + 1, column_names)
+                if index is None:
+                    return None
+                previous = _STRING
+                continue
+            if process and kind in (_NAME, _QUALIFIED_NAME, _STAR):
+                column_names.append(text)
+            previous = _STRING
+            continue
+        if kind == _OPERATOR or kind == _COMMA:
+            previous = kind
+            continue
+        # Parenthesis that is not a literal list or an INSERT column list
+        return None
+    return statement_type, column_names
+
+
+def _skip_literal_list(tokens, index):
+    # Index after "(literal, ...)" starting at index, None if it is anything else
+    if index >= len(tokens) or tokens[index][0] != _OPEN:
+        return None
+    index += 1
+    expect_literal = True
+    while index < len(tokens):
+        kind, text = tokens[index]
+        index += 1
+        if expect_literal:
+            if kind == _OPERATOR and text == '-':
+                continue
+            if kind != _NUMBER and kind != _STRING and not (kind == _WORD and text == 'NULL'):
+                return None
+            expect_literal = False
+        elif kind == _COMMA:
+            expect_literal = True
+        elif kind == _CLOSE:
+            return index
+        else:
+            return None
+    return None
+
+
+def _read_name_list(tokens, index, column_names):
+    # Index after "name, ...)" starting at index, the names are added to column_names
+    expect_name = True
+    while index < len(tokens):
+        kind, text = tokens[index]
+        index += 1
+        if expect_name:
+            if kind != _NAME:
+                return None
+            column_names.append(text)
+            expect_name = False
+        elif kind == _COMMA:
+            expect_name = True
+        elif kind == _CLOSE:
+            return index
+        else:
+            return None
+    return None
@@ -0,0 +1,206 @@
+import hashlib
+import sys
+from collections.abc import Mapping
+
+from sql_cache import column_hash_cache, query_fingerprint_cache
+from sql_lazy import lazy_import
+
+# Only needed for keyed hashing and the non-hex encodings
+base64 = lazy_import('base64')
+hmac = lazy_import('hmac')
+
+
+HASH_ALGORITHMS = ('sha256', 'blake2b', 'blake2s', 'hmac-sha256', 'blake2b-keyed')
+DEFAULT_HASH_ALGORITHM = 'sha256'
+KEYED_HASH_ALGORITHMS = ('hmac-sha256', 'blake2b-keyed')
+
+# How a digest is written into the SQL and the mapping
+DIGEST_ENCODINGS = ('hex', 'base32', 'base64url')
+DEFAULT_DIGEST_ENCODING = 'hex'
+
+
+class DigestCollisionError(ValueError):
+    # Two column names share the same truncated hashed name
+    pass
+
+
+class Hasher:
+    # Turns column names into raw digests with one of HASH_ALGORITHMS.
+    #
+    # The hash object is built once and copied for every name, which skips
+    # the key setup and the keyword handling of the constructors (see
+    # bench/bench_hashers.py).
+    __slots__ = ('algorithm', 'digest_size', '_prototype')
+
+    def __init__(self, algorithm=DEFAULT_HASH_ALGORITHM, digest_size=None, key=None):
+        if algorithm not in HASH_ALGORITHMS:
+            raise ValueError(f"Unknown hash algorithm: {algorithm}")
+        if (key is not None) != (algorithm in KEYED_HASH_ALGORITHMS):
+            raise ValueError(f"Hash algorithm {algorithm} needs a key" if key is None
+                             else f"Hash algorithm {algorithm} does not take a key")
+        if digest_size is not None and algorithm in ('sha256', 'hmac-sha256'):
+            raise ValueError(f"Hash algorithm {algorithm} has a fixed digest size")
+        self.algorithm = algorithm
+        if algorithm == 'sha256':
+            self._prototype = hashlib.sha256()
+        elif algorithm == 'blake2s':
+            self._prototype = hashlib.blake2s(digest_size=32 if digest_size is None else digest_size)
+        elif algorithm == 'hmac-sha256':
+            self._prototype = hmac.new(key, digestmod=hashlib.sha256)
+        else:
+            self._prototype = hashlib.blake2b(key=key or b'',
+                                              digest_size=32 if digest_size is None else digest_size)
+        self.digest_size = self._prototype.digest_size
+
+    def digest(self, original_column_name):
+        hash_object = self._prototype.copy()
+        hash_object.update(original_column_name.encode())
+        return hash_object.digest()
+
+
+class _DigestConfig:
+    __slots__ = ('hasher', 'encoding', 'length', 'owners')
+
+    def __init__(self):
+        self.hasher = Hasher()
+        self.encoding = DEFAULT_DIGEST_ENCODING
+        # Characters kept of the encoded digest, None keeps all of them
+        self.length = None
+        # Truncated hashed name -> column name, only kept while truncating
+        self.owners = {}
+
+
+_CONFIG = _DigestConfig()
+
+
+def configure_digests(encoding=DEFAULT_DIGEST_ENCODING, length=None):
+    if encoding not in DIGEST_ENCODINGS:
+        raise ValueError(f"Unknown digest encoding: {encoding}")
+    if length is not None and length <= 0:
+        raise ValueError(f"Digest length must be positive: {length}")
+    if (encoding, length) != (_CONFIG.encoding, _CONFIG.length):
+        _CONFIG.encoding = encoding
+        _CONFIG.length = length
+        _CONFIG.owners.clear()
+        # Cached query shapes hold hashed names written the old way
+        query_fingerprint_cache.clear()
+
+
+def configure_hasher(algorithm=DEFAULT_HASH_ALGORITHM, digest_size=None, key=None):
+    hasher = Hasher(algorithm, digest_size, key)
+    _CONFIG.hasher = hasher
+    _CONFIG.owners.clear()
+    # Cached digests and query shapes were made by the previous hasher
+    column_hash_cache.clear()
+    query_fingerprint_cache.clear()
+    return hasher
+
+
+def column_digest(original_column_name):
+    # Raw digest of a column name, SHA-256 unless configure_hasher chose otherwise
+    return _CONFIG.hasher.digest(original_column_name)
+
+
+def digest_settings():
+    # Everything that decides the hashed name of a column, as strings, e.g.
+    # to tell whether stored hashed names were made the same way. The key
+    # is only represented by the digest of a fixed name made with it.
+    hasher = _CONFIG.hasher
+    return {
+        'hash_algorithm': hasher.algorithm,
+        'hash_digest_size': str(hasher.digest_size),
+        'hash_check': hasher.digest('\0digest settings').hex(),
+        'digest_encoding': _CONFIG.encoding,
+        'digest_length': 'full' if _CONFIG.length is None else str(_CONFIG.length),
+    }
+
+
+def encode_digest(digest):
+    encoding = _CONFIG.encoding
+    if encoding == 'hex':
+        encoded = digest.hex()
+    elif encoding == 'base32':
+        encoded = base64.b32encode(digest).decode('ascii').rstrip('=').lower()
+    else:
+        # '-' and '_' are part of the alphabet, '-' needs quoting in SQL
+        encoded = base64.urlsafe_b64encode(digest).decode('ascii').rstrip('=')
+    if _CONFIG.length is not None:
+        encoded = encoded[:_CONFIG.length]
+    return encoded
+
+
+def decode_digest(hashed_column_name):
+    # Raw digest of a full-length hashed name in the current encoding, None
+    # if it cannot be decoded (other encoding, truncated names)
+    if _CONFIG.length is not None:
+        return None
+    try:
+        if _CONFIG.encoding == 'hex':
+            digest = bytes.fromhex(hashed_column_name)
+        elif _CONFIG.encoding == 'base32':
+            padded = hashed_column_name.upper() + '=' * (-len(hashed_column_name) % 8)
+            digest = base64.b32decode(padded)
+        else:
+            padded = hashed_column_name + '=' * (-len(hashed_column_name) % 4)
+            digest = base64.urlsafe_b64decode(padded)
+    except ValueError:
+        # binascii.Error is a ValueError
+        return None
+    if len(digest) != _CONFIG.hasher.digest_size:
+        return None
+    return digest
+
+
+def check_collision(original_column_name, hashed_column_name):
+    # Full-length digests do not collide in practice, truncated ones can.
+    # Every truncated name handed out by this process is remembered and
+    # a second column name with the same hashed name is an error.
+    if _CONFIG.length is None:
+        return
+    owner = _CONFIG.owners.setdefault(hashed_column_name, original_column_name)
+    if owner != original_column_name:
+        raise DigestCollisionError(
+            f"Columns {owner!r} and {original_column_name!r} both hash to "
+            f"{hashed_column_name!r}, use a longer --digest-length")
+
+
+class ColumnMapping(Mapping):
+    # Large original -> hashed name mapping, e.g. the merged mapping of a
+    # whole input. Keeps interned column names and raw digests, which take
+    # about half the memory of hashed name strings, and encodes a digest
+    # when it is read.
+    __slots__ = ('_digests',)
+
+    def __init__(self, column_name_mapping=None):
+        self._digests = {}
+        if column_name_mapping:
+            self.update(column_name_mapping)
+
+    def __getitem__(self, original_column_name):
+        return encode_digest(self._digests[original_column_name])
+
+    def __iter__(self):
+        return iter(self._digests)
+
+    def __len__(self):
+        return len(self._digests)
+
+    def __contains__(self, original_column_name):
+        return original_column_name in self._digests
+
+    def add(self, original_column_name, digest):
+        if original_column_name not in self._digests:
+            original_column_name = sys.intern(original_column_name)
+            check_collision(original_column_name, encode_digest(digest))
+            self._digests[original_column_name] = digest
+
+    def update(self, column_name_mapping):
+        # Merge a per-query or per-batch mapping. Only the column names are
+        # used, their digests are recomputed, which also checks for
+        # collisions across everything merged so far.
+        for original_column_name in column_name_mapping:
+            if original_column_name not in self._digests:
+                self.add(original_column_name, column_digest(original_column_name))
+
+    def to_dict(self):
+        return {name: encode_digest(digest) for name, digest in self._digests.items()}
@@ -0,0 +1,19 @@
+import importlib.util
+import sys
+
+
+def lazy_import(name):
+    # Return a module that is only executed on its first attribute access,
+    # so heavy dependencies cost nothing until a query actually needs them
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named {name!r}", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
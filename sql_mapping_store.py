@@ -0,0 +1,195 @@
+import os
+import re
+import sqlite3
+import sys
+
+from sql_cache import LRUCache
+from sql_hashing import column_digest, digest_settings, encode_digest
+from sql_rewriter import ColumnRewriter
+from sql_stream import iter_jsonl_records, iter_sql_records, open_input, open_output, write_jsonl
+
+
+# SQLite builds before 3.32 allow at most 999 parameters per statement
+_LOOKUP_CHUNK_SIZE = 500
+
+# Names already written by this process, they are not sent to SQLite again
+_WRITTEN_CACHE_SIZE = 100000
+
+# Hashed names are words, base64url ones can also contain '-'
+_WORD = re.compile(r'\w+')
+_DASHED_WORD = re.compile(r'[\w-]*-[\w-]*')
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS column_mapping ("
+    "original TEXT PRIMARY KEY, hashed TEXT NOT NULL) WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS column_mapping_hashed ON column_mapping (hashed)",
+    # Hash and digest settings the hashed names were made with, see digest_settings
+    "CREATE TABLE IF NOT EXISTS store_settings ("
+    "name TEXT PRIMARY KEY, value TEXT NOT NULL) WITHOUT ROWID",
+)
+
+
+class MappingStoreMismatchError(ValueError):
+    # The store holds hashed names made with other hash or digest settings
+    pass
+
+
+class MappingStore:
+    # Persistent original -> hashed column name mapping in an SQLite file.
+    #
+    # The database runs in WAL mode so any number of processes can read
+    # while one writes. Nothing is loaded up front: lookups go to the
+    # primary key (original) or to the index on hashed (reverse lookups).
+    # Every process opens its own connection on first use, so a store can
+    # be handed to worker processes.
+    #
+    # A store only ever holds hashed names made with one set of hash and
+    # digest settings. They are recorded on first write and a writable
+    # store opened with other settings raises MappingStoreMismatchError.
+
+    def __init__(self, path, readonly=False):
+        self.path = path
+        self.readonly = readonly
+        self._connection = None
+        self._pid = None
+        self._written = LRUCache(_WRITTEN_CACHE_SIZE)
+
+    def __getstate__(self):
+        return {'path': self.path, 'readonly': self.readonly}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'], state['readonly'])
+
+    @property
+    def connection(self):
+        if self._connection is None or self._pid != os.getpid():
+            self._connection = self._connect()
+            self._pid = os.getpid()
+        return self._connection
+
+    def _connect(self):
+        if self.readonly:
+            connection = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True,
+                                         check_same_thread=False)
+        else:
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            # WAL keeps the database consistent, a crash only loses the last commits
+            connection.execute("PRAGMA synchronous=NORMAL")
+            for statement in _SCHEMA:
+                connection.execute(statement)
+            connection.commit()
+            self._check_settings(connection)
+        # Wait for another process' write instead of failing right away
+        connection.execute("PRAGMA busy_timeout=5000")
+        return connection
+
+    def _check_settings(self, connection):
+        settings = digest_settings()
+        stored = dict(connection.execute("SELECT name, value FROM store_settings"))
+        if not stored:
+            # New store, or one written before the settings were recorded:
+            # its names have to hash the same way as they do now
+            row = connection.execute("SELECT original, hashed FROM column_mapping LIMIT 1").fetchone()
+            if row is not None and encode_digest(column_digest(row[0])) != row[1]:
+                connection.close()
+                raise MappingStoreMismatchError(
+                    f"{self.path} holds hashed names made with other hash or digest settings")
+            with connection:
+                connection.executemany(
+                    "INSERT INTO store_settings (name, value) VALUES (?, ?)", settings.items())
+        elif stored != settings:
+            connection.close()
+            differences = ', '.join(
+                f"{name}={stored.get(name)} (now {value})" if name != 'hash_check' else 'hash key'
+                for name, value in settings.items() if stored.get(name) != value)
+            raise MappingStoreMismatchError(
+                f"{self.path} was written with other hash or digest settings: {differences}")
+
+    def close(self):
+        if self._connection is not None and self._pid == os.getpid():
+            self._connection.close()
+        self._connection = None
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM column_mapping").fetchone()[0]
+
+    def _select_many(self, key_column, value_column, keys):
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        for start in range(0, len(keys), _LOOKUP_CHUNK_SIZE):
+            chunk = keys[start:start + _LOOKUP_CHUNK_SIZE]
+            rows = self.connection.execute(
+                f"SELECT {key_column}, {value_column} FROM column_mapping "
+                f"WHERE {key_column} IN ({', '.join('?' * len(chunk))})", chunk)
+            found.update(rows)
+        return found
+
+    def lookup_many(self, original_column_names):
+        # original -> hashed for every name that is in the store
+        return self._select_many('original', 'hashed', original_column_names)
+
+    def reverse_lookup_many(self, hashed_column_names):
+        # hashed -> original for every hash that is in the store
+        return self._select_many('hashed', 'original', hashed_column_names)
+
+    def lookup(self, original_column_name):
+        return self.lookup_many([original_column_name]).get(original_column_name)
+
+    def reverse_lookup(self, hashed_column_name):
+        return self.reverse_lookup_many([hashed_column_name]).get(hashed_column_name)
+
+    def insert_many(self, column_name_mapping):
+        # Add new names in one transaction, names already stored are left alone.
+        # Returns the number of names sent to the database.
+        rows = [(original, hashed) for original, hashed in column_name_mapping.items()
+                if self._written.get(original) != hashed]
+        if not rows:
+            return 0
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO column_mapping (original, hashed) VALUES (?, ?)", rows)
+        for original, hashed in rows:
+            self._written.put(original, hashed)
+        return len(rows)
+
+
+def deanonymize_query(sql_query, mapping_store):
+    # Put the original column names back into an anonymized query
+    candidates = _WORD.findall(sql_query)
+    if '-' in sql_query:
+        candidates += _DASHED_WORD.findall(sql_query)
+    reverse_mapping = mapping_store.reverse_lookup_many(candidates)
+    if not reverse_mapping:
+        return sql_query
+    return ColumnRewriter(reverse_mapping).rewrite(sql_query)
+
+
+def deanonymize_records(records, mapping_store, query_field='query'):
+    for record, sql_query in records:
+        result = dict(record)
+        result[query_field] = None if sql_query is None else deanonymize_query(sql_query, mapping_store)
+        yield result
+
+
+def run_deanonymize(args):
+    mapping_store = MappingStore(args.mapping_store, readonly=True)
+    input_path = args.input or '-'
+    input_format = args.format
+    if input_format is None:
+        input_format = 'jsonl' if input_path.endswith(('.jsonl', '.ndjson')) else 'sql'
+    input_stream = open_input(input_path)
+    output_stream = open_output(args.output)
+    try:
+        if input_format == 'jsonl':
+            records = iter_jsonl_records(input_stream, args.query_field)
+        else:
+            records = iter_sql_records(input_stream, args.chunk_size)
+        return write_jsonl(deanonymize_records(records, mapping_store, args.query_field),
+                           output_stream, args.batch_size)
+    finally:
+        if input_stream is not sys.stdin:
+            input_stream.close()
+        if output_stream is not sys.stdout:
+            output_stream.close()
+        mapping_store.close()
@@ -1,191 +1,445 @@
-import sqlparse
-import sqlvalidator
-import hashlib
 import json
 import re
+import sys
+
+from sql_lazy import lazy_import
+from sql_cache import (DEFAULT_COLUMN_HASH_CACHE_SIZE, DEFAULT_QUERY_FINGERPRINT_CACHE_SIZE,
+                       DEFAULT_VALIDATION_CACHE_SIZE, column_hash_cache, configure_caches,
+                       query_fingerprint, query_fingerprint_cache, validation_cache)
+from sql_fast_lexer import fast_parse
+from sql_hashing import (DEFAULT_DIGEST_ENCODING, DEFAULT_HASH_ALGORITHM, DIGEST_ENCODINGS,
+                         HASH_ALGORITHMS, DigestCollisionError, check_collision, column_digest, configure_digests,
+                         configure_hasher, encode_digest)
+from sql_rewriter import ColumnRewriter, rewrite_statements
+from sql_stats import STATS
+
+# sqlparse and sqlvalidator take most of the import time, they are loaded
+# when the first query needs them
+sqlparse = lazy_import('sqlparse')
+sqlvalidator = lazy_import('sqlvalidator')
+# Only runs once a query is parsed or --schema is given
+sql_schema = lazy_import('sql_schema')
+
+
+# 'regex' rewrites whole words of the query text, 'tokens' rewrites the
+# name tokens of the parse tree and leaves literals and table names alone
+REWRITE_MODES = ('regex', 'tokens')
+
+
+_UNCHECKED = object()
+
+
+class ParsedQuery:
+    # Parse a query once and share the result between the statement type
+    # check, the validation, the column mapping and the rewritten SQL.
+    # Every property is computed on first access and then reused.
+    # Queries with the same shape as an earlier one (see query_fingerprint)
+    # reuse its statement type, column mapping and ColumnRewriter without
+    # being parsed.
+    # Simple statements are read by fast_parse, sqlparse is only used for
+    # the others or when the token rewrite mode needs the parse tree.
+    # With a schema (see configure_schema) the column mapping and the
+    # rewrite, in either mode, are lookups in the precomputed schema mapping.
+
+    def __init__(self, sql_query, use_cache=True, rewrite_mode='regex', use_fast_path=True,
+                 use_schema=True):
+        if rewrite_mode not in REWRITE_MODES:
+            raise ValueError(f"Unknown rewrite mode: {rewrite_mode}")
+        self.sql_query = sql_query
+        self.use_cache = use_cache
+        self.rewrite_mode = rewrite_mode
+        self.use_fast_path = use_fast_path and rewrite_mode == 'regex'
+        self.schema = sql_schema.active_schema() if use_schema else None
+        self._statements = None
+        self._fast = _UNCHECKED
+        self._fingerprint = None
+        self._shape = _UNCHECKED
+        self._is_valid = None
+        self._column_name_mapping = None
+        self._rewriter = None
+        self._modified_sql = None
+
+    @property
+    def statements(self):
+        if self._statements is None:
+            # sqlparse tokenizes the query only once for this object
+            with STATS.time('tokenize'):
+                self._statements = sqlparse.parse(self.sql_query)
+        return self._statements
+
+    @property
+    def fingerprint(self):
+        if self._fingerprint is None:
+            self._fingerprint = query_fingerprint(self.sql_query)
+        return self._fingerprint
+
+    def _cached_shape(self):
+        # (statement type, column mapping) of an earlier query with the same fingerprint
+        if self._shape is _UNCHECKED:
+            self._shape = None
+            if self.use_cache:
+                self._shape = query_fingerprint_cache.get(self.fingerprint)
+                if STATS.enabled:
+                    STATS.incr('fingerprint_cache_hits' if self._shape is not None
+                               else 'fingerprint_cache_misses')
+        return self._shape
+
+    def _fast_parse(self):
+        # (statement type, column names) of a simple statement, None otherwise
+        if self._fast is _UNCHECKED:
+            self._fast = None
+            if self.use_fast_path:
+                with STATS.time('fast_parse'):
+                    self._fast = fast_parse(self.sql_query)
+                if STATS.enabled:
+                    STATS.incr('fast_path_hits' if self._fast is not None
+                               else 'fast_path_fallbacks')
+        return self._fast
+
+    @property
+    def statement_type(self):
+        shape = self._cached_shape()
+        if shape is not None:
+            return shape[0]
+        fast = self._fast_parse()
+        if fast is not None:
+            return fast[0]
+        try:
+            if self.statements:
+                return self.statements[0].get_type()
+        except Exception as e:
+            # Handle parsing errors gracefully
+            pass
+        return 'UNKNOWN'
+
+    @property
+    def is_select(self):
+        return self.statement_type == 'SELECT'
+
+    @property
+    def is_valid(self):
+        if self._is_valid is None:
+            # The result depends on the literals too (ORDER BY 1 is valid,
+            # ORDER BY 2 is not), so only the same query text reuses it
+            if self.use_cache:
+                self._is_valid = validation_cache.get(self.sql_query)
+                if STATS.enabled:
+                    STATS.incr('validation_cache_hits' if self._is_valid is not None
+                               else 'validation_cache_misses')
+            if self._is_valid is None:
+                if not precheck_query(self.sql_query):
+                    self._is_valid = False
+                    if STATS.enabled:
+                        STATS.incr('precheck_rejections')
+                else:
+                    try:
+                        # sqlvalidator has its own parser, so it only runs when asked
+                        with STATS.time('validate'):
+                            self._is_valid = bool(sqlvalidator.parse(self.sql_query).is_valid())
+                    except Exception as e:
+                        self._is_valid = False
+                if self.use_cache:
+                    validation_cache.put(self.sql_query, self._is_valid)
+        return self._is_valid
+
+    @property
+    def is_processable(self):
+        # Only SELECT statements go through the validation check
+        return not self.is_select or self.is_valid
+
+    @property
+    def column_name_mapping(self):
+        if self._column_name_mapping is None:
+            if self.schema is not None:
+                # Known columns only, the rewrite comes out of the same pass in
+                # both modes: the mapping holds the DDL spelling of a name, not
+                # always the one the query uses
+                with STATS.time('rewrite'):
+                    self._modified_sql, self._column_name_mapping = (
+                        self.schema.anonymize(self.sql_query))
+                return self._column_name_mapping
+            shape = self._cached_shape()
+            if shape is not None:
+                # Same shape as an earlier query, only the literals differ
+                self._column_name_mapping = dict(shape[1])
+                self._rewriter = shape[2]
+                return self._column_name_mapping
+            column_name_mapping = {}
+            fast = self._fast_parse()
+            if fast is not None:
+                for column_name in fast[1]:
+                    map_original_hashed_column_name(column_name, column_name_mapping)
+            else:
+                process_token = True
+                statements = self.statements
+                # Traverse the parsed SQL tokens and build the mapping
+                with STATS.time('walk'):
+                    for statement in statements:
+                        parse_statement(statement, column_name_mapping, process_token)
+            self._column_name_mapping = column_name_mapping
+            if self.use_cache:
+                # Built once per shape, every later query of the shape rewrites with it
+                self._rewriter = ColumnRewriter(column_name_mapping)
+                query_fingerprint_cache.put(
+                    self.fingerprint, (self.statement_type, dict(column_name_mapping), self._rewriter))
+        return self._column_name_mapping
+
+    @property
+    def modified_sql(self):
+        if self._modified_sql is None:
+            column_name_mapping = self.column_name_mapping
+            if self._modified_sql is not None:
+                # Rewritten together with the mapping from the schema
+                return self._modified_sql
+            with STATS.time('rewrite'):
+                if self.rewrite_mode == 'tokens':
+                    # Reuse the parse tree instead of scanning the text again
+                    self._modified_sql = rewrite_statements(
+                        self.statements, column_name_mapping)
+                elif self._rewriter is not None:
+                    self._modified_sql = self._rewriter.rewrite(self.sql_query)
+                else:
+                    self._modified_sql = modified_query(
+                        self.sql_query, column_name_mapping)
+        return self._modified_sql
+
+
+# Strings, quoted identifiers and comments are skipped as a whole. What is
+# left is checked for parentheses, stray quotes and a FROM without a table.
+_PRECHECK_PATTERN = re.compile(
+    r"'(?:[^'\\]|''|\\.)*'|\"(?:[^\"\\]|\"\"|\\.)*\"|`[^`]*`|--[^\n]*|/\*.*?\*/"
+    r"|([()])|(['\"])"
+    r"|(\bFROM\s*(?:;|$|(?:WHERE|GROUP|ORDER|LIMIT|HAVING|UNION)\b))",
+    re.IGNORECASE | re.DOTALL)
+
+
+def precheck_query(sql_query):
+    # Cheap structural check run before the full validation: False for
+    # unbalanced parentheses, unterminated quotes or a FROM clause without
+    # a table. True does not mean the query is valid.
+    depth = 0
+    for match in _PRECHECK_PATTERN.finditer(sql_query):
+        parenthesis, quote, missing_table = match.groups()
+        if parenthesis == '(':
+            depth += 1
+        elif parenthesis == ')':
+            depth -= 1
+            if depth < 0:
+                return False
+        elif quote or missing_table:
+            return False
+    return depth == 0
 
 
 def is_select_statement(sql_query):
     try:
-        # Parse the SQL query using sqlparse
-        parsed = sqlparse.parse(sql_query)
         # Check if the first statement is a SELECT statement
-        if parsed and parsed[0].get_type() == 'SELECT':
-            return True
-        return False
+        return ParsedQuery(sql_query).is_select
     except Exception as e:
         # Handle parsing errors gracefully
         return False
 
 
 def validate_sql_query(sql_query):
-    try:
-        # Attempt to parse the SQL query to check for syntax errors
-        parsed = sqlvalidator.parse(sql_query)
-        if not parsed.is_valid():
-            return False  # The query is invalid
-        return True  # The query is valid
-    except Exception as e:
-        return False  # An exception occurred, indicating an invalid query
+    # Attempt to parse the SQL query to check for syntax errors
+    return ParsedQuery(sql_query).is_valid
 
 
 def hash_column_names(sql_query):
     try:
-        # Parse the SQL query using sqlparse
-        parsed = sqlparse.parse(sql_query)
-        column_name_mapping = {}
-        process_token = True
-        # Traverse the parsed SQL tokens and build the mapping
-        for statement in parsed:
-            parse_statement(statement, column_name_mapping, process_token)
-
-        return column_name_mapping
+        return ParsedQuery(sql_query).column_name_mapping
     except Exception as e:
         # Handle parsing errors gracefully
         print(f"Error parsing SQL: {str(e)}")
         return {}, set()
 
 
+# Keywords that start a clause whose tokens are not column names
+_PROCESS_OFF_KEYWORDS = frozenset([
+    'FROM', 'JOIN', 'INNER JOIN', 'LEFT JOIN', 'RIGHT JOIN', 'FULL JOIN', 'CROSS JOIN',
+    'LEFT OUTER JOIN', 'RIGHT OUTER JOIN', 'FULL OUTER JOIN',
+])
+# Keywords that start a clause whose tokens are column names again
+_PROCESS_ON_KEYWORDS = frozenset(['ON', 'SET'])
+
+
 def flag_controller(token, process_token):
     # ditect which token has to be processed or not
-    if token.ttype == sqlparse.tokens.DML and token.value.upper() == 'UPDATE':
-        # This token indicates the start of the UPDATE clause
-        process_token = False
-    if token.ttype == sqlparse.tokens.Keyword and token.value.upper() == 'FROM':
-        # This token indicates the start of the FROM clause
+    ttype = token.ttype
+    if ttype is sqlparse.tokens.DML:
+        # This token indicates the start of the UPDATE clause, which names a
+        # table, or of a SELECT/INSERT/DELETE, e.g. after a CTE or a UNION
+        process_token = token.normalized != 'UPDATE'
+    elif ttype is sqlparse.tokens.Keyword:
+        if token.normalized in _PROCESS_OFF_KEYWORDS:
+            # This token indicates the start of the FROM or JOIN clause
+            process_token = False
+        elif token.normalized in _PROCESS_ON_KEYWORDS:
+            # This token indicates the start of the ON or SET clause
+            process_token = True
+    elif ttype is sqlparse.tokens.Keyword.CTE:
+        # This token indicates the start of the WITH clause, which names CTEs
         process_token = False
-    if token.ttype == sqlparse.tokens.Keyword and (token.value.upper() == 'INNER JOIN' or token.value.upper() == 'LEFT JOIN' or token.value.upper() == 'RIGHT JOIN' or token.value.upper() == 'FULL OUTER JOIN' or token.value.upper() == 'FULL OUTER JOIN'):
-        # This token indicates the start of the JOIN clause
-        process_token = False
-    if isinstance(token, sqlparse.sql.Where):
+    elif ttype is None and isinstance(token, sqlparse.sql.Where):
         # This token indicates the start of the Where clause
         process_token = True
-    if token.ttype == sqlparse.tokens.Keyword and (token.value.upper() == 'ON' or token.value.upper() == 'SET'):
-        # This token indicates the start of the ON clause
-        process_token = True
     return process_token
 
 
+def _is_subquery(parenthesis):
+    # "(SELECT ...)" or "(WITH ...)" as opposed to an expression or value list
+    for token in parenthesis.tokens[1:]:
+        if not token.is_whitespace:
+            return token.ttype is sqlparse.tokens.DML or token.ttype is sqlparse.tokens.Keyword.CTE
+    return False
+
+
+def _visit_identifier(token, column_name_mapping):
+    children = token.tokens
+    if len(children) == 1 and children[0].ttype is sqlparse.tokens.Name:
+        # Plain column name, by far the most common case
+        map_original_hashed_column_name(children[0].value, column_name_mapping)
+        return None
+    if (len(children) == 3 and children[2].ttype is sqlparse.tokens.Name
+            and children[1].ttype is sqlparse.tokens.Punctuation and children[1].value == '.'):
+        # Qualified column name such as "Orders.OrderID"
+        map_original_hashed_column_name(children[2].value, column_name_mapping)
+        return None
+    for child in children:
+        if child.is_group and not isinstance(child, sqlparse.sql.Identifier):
+            # Computed column such as "SUM(price) AS total": walk the
+            # expression, the alias is not a column
+            return [child for child in children
+                    if child.is_group and not isinstance(child, sqlparse.sql.Identifier)]
+    # Aliased or quoted column
+    map_original_hashed_column_name(token.get_real_name(), column_name_mapping)
+    return None
+
+
+def _visit_function(token, column_name_mapping):
+    # The first child is the function name, the rest holds its arguments
+    return token.tokens[1:]
+
+
+# Group types that need more than walking all of their children. A handler
+# returns the children to walk next, or None when the group is done. Built on
+# first use so importing this module does not load sqlparse.
+_TOKEN_HANDLERS = {}
+
+
+def _token_handlers():
+    if not _TOKEN_HANDLERS:
+        _TOKEN_HANDLERS[sqlparse.sql.Identifier] = _visit_identifier
+        _TOKEN_HANDLERS[sqlparse.sql.Function] = _visit_function
+    return _TOKEN_HANDLERS
+
+# How the tokens of a stack frame are read:
+#   _STATEMENT:  clauses of a statement or subquery, flag_controller decides
+#                which clauses hold column names
+#   _EXPRESSION: inside a clause that holds column names
+#   _TABLES:     inside a clause that names tables, only subqueries matter
+_STATEMENT, _EXPRESSION, _TABLES = range(3)
+
+
+def _walk(tokens, column_name_mapping, process_token):
+    # Depth-first walk over the parse tree. The stack holds one frame per
+    # open group, so any nesting depth is handled without recursion and
+    # columns are found in the order they appear. Subqueries (WHERE IN,
+    # EXISTS, derived tables, CTEs) are walked in place as a new statement
+    # frame and add their columns to the same mapping.
+    handlers = _token_handlers()
+    visited = 0
+    stack = [[iter(tokens), _STATEMENT, process_token]]
+    while stack:
+        frame = stack[-1]
+        mode = frame[1]
+        for token in frame[0]:
+            visited += 1
+            token_mode = mode
+            if mode == _STATEMENT:
+                frame[2] = flag_controller(token, frame[2])
+                token_mode = _EXPRESSION if frame[2] else _TABLES
+            if not token.is_group:
+                if token_mode == _EXPRESSION and token.ttype is sqlparse.tokens.Wildcard:
+                    # This token represents wildcard (*)
+                    map_original_hashed_column_name("*", column_name_mapping)
+                continue
+            if isinstance(token, sqlparse.sql.Parenthesis) and _is_subquery(token):
+                # Nested query: its clauses start over, selecting columns first
+                stack.append([iter(token.tokens), _STATEMENT, True])
+                break
+            if token_mode == _TABLES:
+                stack.append([iter(token.tokens), _TABLES, None])
+                break
+            handler = handlers.get(type(token))
+            if handler is None:
+                # Lists, comparisons, WHERE clauses, operations...
+                children = token.tokens
+            else:
+                children = handler(token, column_name_mapping)
+            if children:
+                stack.append([iter(children), _EXPRESSION, None])
+                break
+        else:
+            stack.pop()
+    return visited
+
+
 def parse_statement(statement, column_name_mapping, process_token):
-    for token in statement.tokens:
-        process_token = flag_controller(token, process_token)
-
-        if process_token:
-            if token.ttype == sqlparse.tokens.Wildcard:
-                # This token represents wildcard (*)
-                map_original_hashed_column_name("*", column_name_mapping)
-            elif isinstance(token, sqlparse.sql.Identifier):
-                # This token represents an identifier
-                map_original_hashed_column_name(
-                    token.get_real_name(), column_name_mapping)
-            elif isinstance(token, sqlparse.sql.IdentifierList):
-                # This token represents a list of identifiers ( For multiple column selection)
-                for indentifier_list_token in token.tokens:
-                    if isinstance(indentifier_list_token, sqlparse.sql.Function):
-                        for function_token in indentifier_list_token.tokens:
-                            if isinstance(function_token, sqlparse.sql.Parenthesis):
-                                for identifier_token_inside_function in function_token.tokens:
-                                    if isinstance(identifier_token_inside_function, sqlparse.sql.Identifier):
-                                        map_original_hashed_column_name(
-                                            identifier_token_inside_function.get_real_name(), column_name_mapping)
-                    elif isinstance(indentifier_list_token, sqlparse.sql.Identifier):
-                        map_original_hashed_column_name(
-                            indentifier_list_token.get_real_name(), column_name_mapping)
-                    elif isinstance(indentifier_list_token, sqlparse.sql.Comparison):
-                        # This token represents an Comparisons
-                        for comparison_token in indentifier_list_token.tokens:
-                            if isinstance(comparison_token, sqlparse.sql.Identifier):
-                                map_original_hashed_column_name(
-                                    comparison_token.get_real_name(), column_name_mapping)
-            elif isinstance(token, sqlparse.sql.Comparison):
-                # This token represents an Comparisons
-                for comparison_token in token.tokens:
-                    if isinstance(comparison_token, sqlparse.sql.Identifier):
-                        map_original_hashed_column_name(
-                            comparison_token.get_real_name(), column_name_mapping)
-            elif isinstance(token, sqlparse.sql.Function):
-                # This token represents a function in INSERT query statement
-                for function_token in token.tokens:
-                    if isinstance(function_token, sqlparse.sql.Parenthesis):
-                        for identifier_token_inside_function in function_token.tokens:
-                            if identifier_token_inside_function.ttype == sqlparse.tokens.Wildcard:
-                                # This token represents wildcard (*)
-                                map_original_hashed_column_name(
-                                    "*", column_name_mapping)
-                            elif isinstance(identifier_token_inside_function, sqlparse.sql.Identifier):
-                                map_original_hashed_column_name(
-                                    identifier_token_inside_function.get_real_name(), column_name_mapping)
-                            elif isinstance(identifier_token_inside_function, sqlparse.sql.IdentifierList):
-                                for identifier_inside_function in identifier_token_inside_function.get_identifiers():
-                                    map_original_hashed_column_name(
-                                        identifier_inside_function.get_real_name(), column_name_mapping)
-            elif isinstance(token, sqlparse.sql.Parenthesis):
-                for parenthesis_token in token.tokens:
-                    if isinstance(parenthesis_token, sqlparse.sql.Identifier):
-                        map_original_hashed_column_name(
-                            parenthesis_token.get_real_name(), column_name_mapping)
-                    elif isinstance(parenthesis_token, sqlparse.sql.IdentifierList):
-                        for identifier_parenthesis in parenthesis_token.get_identifiers():
-                            map_original_hashed_column_name(
-                                identifier_parenthesis.get_real_name(), column_name_mapping)
-            elif isinstance(token, sqlparse.sql.Where):
-                for where_token in token.tokens:
-                    if isinstance(where_token, sqlparse.sql.Comparison):
-                        # This token represents condition inside where clause
-                        for comparison_token in where_token.tokens:
-                            if isinstance(comparison_token, sqlparse.sql.Identifier):
-                                map_original_hashed_column_name(
-                                    comparison_token.get_real_name(), column_name_mapping)
-                    elif isinstance(where_token, sqlparse.sql.Identifier):
-                        # This token represents Indentifier inside where clause
-                        map_original_hashed_column_name(
-                            where_token.get_real_name(), column_name_mapping)
-                    elif isinstance(where_token, sqlparse.sql.Parenthesis):
-                        # This will check nested query and rerun to find the columns.
-                        nested_query = where_token.value.replace(
-                            "(", "").replace(")", "")
-                        hash_column_names(nested_query)
+    # Walk the clauses that hold column names, subqueries included
+    visited = _walk(statement.tokens, column_name_mapping, process_token)
+    if STATS.enabled:
+        STATS.incr('tokens_visited', visited)
+
 
 def map_original_hashed_column_name(original_column_name, column_name_mapping):
-    # Hash the original column name
-    hashed_column_name = hashlib.sha256(
-        original_column_name.encode()).hexdigest()
+    # Reuse the digest of a column name that was seen before, the cache
+    # holds raw digests and they are encoded for the mapping. Truncated
+    # names are checked for collisions on every use, cached or not: the
+    # names checked so far are forgotten when the digest settings change.
+    digest = column_hash_cache.get(original_column_name)
+    if digest is None:
+        # Hash the original column name
+        with STATS.time('hash'):
+            digest = column_digest(original_column_name)
+        original_column_name = sys.intern(original_column_name)
+        hashed_column_name = encode_digest(digest)
+        # A colliding name is never cached, it fails again on its next use
+        check_collision(original_column_name, hashed_column_name)
+        column_hash_cache.put(original_column_name, digest)
+        if STATS.enabled:
+            STATS.incr('columns_hashed')
+    else:
+        hashed_column_name = encode_digest(digest)
+        check_collision(original_column_name, hashed_column_name)
+        if STATS.enabled:
+            STATS.incr('column_hash_cache_hits')
     # Update the mapping
-    column_name_mapping[original_column_name] = hashed_column_name 
-    
-
-def modified_query(sql_query, column_name_mapping):
-    # Initialize the modified query with the original SQL query
-    # modified_query = sql_query
+    column_name_mapping[original_column_name] = hashed_column_name
 
-    # Replace column names in the SQL query
-    # for column_name, hashed_value in column_name_mapping.items():
-    #     modified_query = modified_query.replace(column_name, hashed_value)
-    
-    # Generate the dynamic regular expression pattern based on keys in the column_mapping
-    column_pattern = re.compile(r'\b(' + '|'.join(re.escape(key) for key in column_name_mapping.keys()) + r')\b')
 
-    # Replace column names with mapped values using regular expressions
-    modified_query = column_pattern.sub(lambda match: column_name_mapping[match.group(0)], sql_query)
+def modified_query(sql_query, column_name_mapping):
+    # Replace column names with mapped values, whole words only
+    return ColumnRewriter(column_name_mapping).rewrite(sql_query)
 
-    return modified_query
 
-if __name__ == "__main__":
+def run_interactive(mapping_store=None):
     while True:
         sql_query = input("Enter an SQL query or 'exit' to quit: ")
         if sql_query.lower() == 'exit':
             break
 
-        process = True
-
-        if is_select_statement(sql_query):
-            # Attempt to check it is a select statement or not. if the select statement it goes throw the validation check
-            if not validate_sql_query(sql_query):
-                process = False
+        with STATS.query():
+            parsed_query = ParsedQuery(sql_query)
+            # A SELECT statement has to pass the validation check, anything else is processed directly
+            process = parsed_query.is_processable
+            if process:
+                column_name_mapping = parsed_query.column_name_mapping
+                modified_sql = parsed_query.modified_sql
+                if mapping_store is not None:
+                    mapping_store.insert_many(column_name_mapping)
 
         if process:
-            column_name_mapping = hash_column_names(sql_query)
-            modified_sql = modified_query(sql_query, column_name_mapping)
             print("------------------------------------")
             print("****** Input SQL ******")
             print("------------------------------------")
@@ -207,3 +461,157 @@ if __name__ == "__main__":
             print("------------------------------------")
             print("Query Invalid")
             print("------------------------------------")
+
+
+def build_arg_parser():
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Anonymize the column names of SQL queries. "
+                    "Without --input the interactive prompt is started.")
+    parser.add_argument("--input", help="SQL or JSONL file to anonymize, '-' for stdin")
+    parser.add_argument("--serve-stdin", action="store_true",
+                        help="stay running and answer one JSON line per query line read from stdin")
+    parser.add_argument("--serve-port", type=int,
+                        help="serve JSON line requests over TCP on this port, 0 picks a free port")
+    parser.add_argument("--serve-host", default="127.0.0.1", help="address --serve-port binds to")
+    parser.add_argument("--serve-socket", help="serve JSON line requests on this unix socket")
+    parser.add_argument("--max-batch-size", type=int, default=64,
+                        help="most requests the server anonymizes in one batch")
+    parser.add_argument("--max-batch-latency-ms", type=float, default=5.0,
+                        help="longest time the server waits to fill a batch")
+    parser.add_argument("--max-pending", type=int, default=1024,
+                        help="most requests waiting for a batch before the server stops reading")
+    parser.add_argument("--max-in-flight", type=int, default=64,
+                        help="most unanswered requests per connection")
+    parser.add_argument("--max-request-bytes", type=int, default=16 * 1024 * 1024,
+                        help="longest request line the server reads, longer ones get an error response")
+    parser.add_argument("--output", default="-", help="JSONL output file, '-' for stdout")
+    parser.add_argument("--format", choices=["sql", "jsonl"],
+                        help="input format, guessed from the file extension by default")
+    parser.add_argument("--query-field", default="query",
+                        help="field holding the query in JSONL input")
+    parser.add_argument("--batch-size", type=int, default=1000,
+                        help="number of output records written at a time")
+    parser.add_argument("--chunk-size", type=int, default=64 * 1024,
+                        help="number of characters read at a time from SQL input")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of worker processes anonymizing batches in parallel")
+    parser.add_argument("--mapping-output",
+                        help="JSON file receiving the merged column mapping of all queries")
+    parser.add_argument("--mapping-store",
+                        help="SQLite file recording every column mapping, shared between runs")
+    parser.add_argument("--deanonymize", action="store_true",
+                        help="put the original column names of --mapping-store back into the "
+                             "queries of --input")
+    parser.add_argument("--rewrite-mode", choices=REWRITE_MODES, default="regex",
+                        help="'regex' replaces every whole-word match in the query text, "
+                             "'tokens' only replaces column name tokens of the parse tree")
+    parser.add_argument("--digest-encoding", choices=DIGEST_ENCODINGS,
+                        default=DEFAULT_DIGEST_ENCODING,
+                        help="how hashed column names are written; base64url names contain "
+                             "'-' and need quoting to stay valid SQL")
+    parser.add_argument("--digest-length", type=int,
+                        help="keep only this many characters of each hashed column name, "
+                             "colliding names are reported as an error")
+    parser.add_argument("--schema",
+                        help="DDL file whose CREATE TABLE columns are the only names anonymized, "
+                             "hashed once up front instead of being discovered in every query")
+    parser.add_argument("--hash-algorithm", choices=HASH_ALGORITHMS, default=DEFAULT_HASH_ALGORITHM,
+                        help="hash function of the column names; the keyed ones need --hash-key-file")
+    parser.add_argument("--hash-key-file",
+                        help="file holding the secret key of hmac-sha256 or blake2b-keyed")
+    parser.add_argument("--hash-digest-size", type=int,
+                        help="digest size in bytes of the blake2 algorithms, 32 by default")
+    parser.add_argument("--hash-cache-size", type=int, default=DEFAULT_COLUMN_HASH_CACHE_SIZE,
+                        help="maximum number of column hashes kept in memory, 0 disables the cache")
+    parser.add_argument("--fingerprint-cache-size", type=int,
+                        default=DEFAULT_QUERY_FINGERPRINT_CACHE_SIZE,
+                        help="maximum number of query shapes whose column mapping is reused, "
+                             "0 disables the cache")
+    parser.add_argument("--validation-cache-size", type=int, default=DEFAULT_VALIDATION_CACHE_SIZE,
+                        help="maximum number of queries whose validation result is reused, "
+                             "0 disables the cache")
+    parser.add_argument("--preload-mapping",
+                        help="mapping JSON file (see --mapping-output) used to warm the hash cache")
+    parser.add_argument("--stats", action="store_true",
+                        help="print per-stage timings and counters to stderr at exit")
+    parser.add_argument("--stats-json",
+                        help="JSON file receiving the stats, at exit and every --stats-interval seconds")
+    parser.add_argument("--stats-interval", type=float,
+                        help="seconds between two dumps of --stats-json")
+    parser.add_argument("--profile-every", type=int, default=0,
+                        help="run every Nth query under cProfile")
+    parser.add_argument("--profile-output", default="sql_parser.prof",
+                        help="pstats file receiving the sampled profile")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="trace memory allocations with tracemalloc and report the peak")
+    return parser
+
+
+def read_hash_key(path):
+    # The key is read from a file so it does not show up in the process list
+    if path is None:
+        return None
+    with open(path, 'rb') as key_file:
+        key = key_file.read()
+    # Only the newline an editor or echo adds at the end, any other byte
+    # may be part of a binary key
+    if key.endswith(b'\r\n'):
+        return key[:-2]
+    if key.endswith(b'\n'):
+        return key[:-1]
+    return key
+
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    args.hash_key = read_hash_key(args.hash_key_file)
+    try:
+        configure_hasher(args.hash_algorithm, args.hash_digest_size, args.hash_key)
+        configure_digests(args.digest_encoding, args.digest_length)
+    except ValueError as error:
+        raise SystemExit(str(error))
+    if args.schema is not None:
+        try:
+            sql_schema.configure_schema(args.schema)
+        except OSError as error:
+            raise SystemExit(f"Error: cannot read --schema: {error}")
+    configure_caches(args.hash_cache_size, args.fingerprint_cache_size, args.preload_mapping,
+                     args.validation_cache_size)
+    if args.stats or args.stats_json or args.profile_every or args.trace_memory:
+        STATS.enable(args.profile_every, args.stats_json, args.stats_interval, args.trace_memory)
+    try:
+        if args.deanonymize:
+            if args.mapping_store is None:
+                raise SystemExit("--deanonymize needs --mapping-store")
+            from sql_mapping_store import run_deanonymize
+            run_deanonymize(args)
+        elif args.serve_stdin:
+            # Imported here because sql_stream builds on this module
+            from sql_stream import run_serve
+            run_serve(args)
+        elif args.serve_port is not None or args.serve_socket:
+            from sql_server import run_server
+            run_server(args)
+        elif args.input is None:
+            from sql_stream import open_mapping_store
+            run_interactive(open_mapping_store(args.mapping_store))
+        else:
+            from sql_stream import run_batch
+            run_batch(args)
+    except DigestCollisionError as error:
+        # Output written so far is incomplete, the run has to be repeated
+        # with a longer --digest-length
+        raise SystemExit(f"Error: {error}")
+    finally:
+        if STATS.enabled:
+            if args.stats or args.trace_memory:
+                STATS.report()
+            else:
+                STATS.dump()
+            STATS.save_profile(args.profile_output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+import re
+
+from sql_lazy import lazy_import
+
+sqlparse = lazy_import('sqlparse')
+
+
+# Column names made of word characters only, which is nearly all of them
+_WORD_NAME = re.compile(r'\w+')
+# Splits SQL text into [non-word, word, non-word, word, ...]
+_WORD_SPLIT = re.compile(r'(\w+)')
+
+
+class ColumnRewriter:
+    # Replace column names in SQL text with their hashed names.
+    #
+    # Word-character column names are looked up in a dict for every word of
+    # the query, so adding columns never recompiles anything. The few names
+    # with other characters (e.g. '*' or quoted names with spaces) go into
+    # one compiled alternation that is rebuilt only when that set changes.
+    # A whole word is replaced only if it matches exactly, the same as the
+    # r'\b(name)\b' pattern the rewrite used before.
+
+    def __init__(self, column_name_mapping=None):
+        self._word_mapping = {}
+        self._other_mapping = {}
+        self.version = 0
+        self._pattern = None
+        self._pattern_version = -1
+        if column_name_mapping:
+            self.update(column_name_mapping)
+
+    def __len__(self):
+        return len(self._word_mapping) + len(self._other_mapping)
+
+    def add(self, original_column_name, hashed_column_name):
+        if _WORD_NAME.fullmatch(original_column_name):
+            self._word_mapping[original_column_name] = hashed_column_name
+        elif self._other_mapping.get(original_column_name) != hashed_column_name:
+            self._other_mapping[original_column_name] = hashed_column_name
+            self.version += 1
+
+    def update(self, column_name_mapping):
+        for original_column_name, hashed_column_name in column_name_mapping.items():
+            self.add(original_column_name, hashed_column_name)
+
+    def _compiled_pattern(self):
+        # Recompiled only when a non-word column name was added since the last call
+        if self._pattern_version != self.version:
+            self._pattern = re.compile(
+                r'\b(' + '|'.join(re.escape(key) for key in self._other_mapping) + r')\b|\w+')
+            self._pattern_version = self.version
+        return self._pattern
+
+    def _replace(self, match):
+        if match.group(1) is not None:
+            return self._other_mapping[match.group(1)]
+        word = match.group(0)
+        return self._word_mapping.get(word, word)
+
+    def rewrite(self, sql_query):
+        if self._other_mapping:
+            return self._compiled_pattern().sub(self._replace, sql_query)
+        # Fast path: swap every word that is a column name in one list pass
+        lookup = self._word_mapping.get
+        parts = _WORD_SPLIT.split(sql_query)
+        parts[1::2] = [lookup(word, word) for word in parts[1::2]]
+        return ''.join(parts)
+
+
+# Keywords after which the next identifiers name tables rather than columns
+_TABLE_KEYWORDS = frozenset([
+    'FROM', 'INTO', 'UPDATE', 'TABLE', 'JOIN', 'INNER JOIN', 'LEFT JOIN', 'RIGHT JOIN',
+    'FULL JOIN', 'CROSS JOIN', 'LEFT OUTER JOIN', 'RIGHT OUTER JOIN', 'FULL OUTER JOIN',
+])
+
+
+def _table_name_leaves(statements):
+    # Collect the leaf tokens that name tables or their aliases, e.g. the
+    # "Customers c" in "FROM Customers c" or the "Customers" of
+    # "INSERT INTO Customers (...)". Subqueries are visited as well.
+    excluded = set()
+    stack = list(statements)
+    while stack:
+        token_list = stack.pop()
+        in_table_clause = False
+        for token in token_list.tokens:
+            if token.is_whitespace or (token.ttype is sqlparse.tokens.Punctuation and token.value == ','):
+                continue
+            if token.ttype in sqlparse.tokens.Keyword:
+                in_table_clause = token.normalized in _TABLE_KEYWORDS
+                continue
+            if in_table_clause:
+                targets = token.tokens if isinstance(token, sqlparse.sql.IdentifierList) else [token]
+                for target in targets:
+                    if isinstance(target, sqlparse.sql.Function):
+                        # Table with a column list: only the table name is excluded
+                        target = target.tokens[0]
+                    if isinstance(target, sqlparse.sql.Identifier):
+                        for leaf in target.tokens:
+                            if isinstance(leaf, sqlparse.sql.Identifier):
+                                # The alias of "Customers AS c"
+                                excluded.update(id(alias_leaf) for alias_leaf in leaf.flatten())
+                            elif not leaf.is_group:
+                                excluded.add(id(leaf))
+            if token.is_group:
+                stack.append(token)
+    return excluded
+
+
+# Token type -> 'name', 'symbol' or None, filled in as token types are seen
+_LEAF_KINDS = {}
+
+
+def _leaf_kind(ttype):
+    kind = None
+    if ttype in sqlparse.tokens.Name:
+        kind = 'name'
+    elif ttype in sqlparse.tokens.String.Symbol:
+        kind = 'symbol'
+    _LEAF_KINDS[ttype] = kind
+    return kind
+
+
+def rewrite_statements(statements, column_name_mapping):
+    # Rebuild the query from the sqlparse leaf tokens, replacing only name
+    # tokens that are mapped columns. String literals, table names, aliases
+    # and "table." qualifiers are left as they are.
+    excluded = _table_name_leaves(statements)
+    punctuation_type = sqlparse.tokens.Punctuation
+    lookup = column_name_mapping.get
+    parts = []
+    for statement in statements:
+        leaves = list(statement.flatten())
+        leaves.append(None)
+        for index in range(len(leaves) - 1):
+            leaf = leaves[index]
+            value = leaf.value
+            ttype = leaf.ttype
+            kind = _LEAF_KINDS[ttype] if ttype in _LEAF_KINDS else _leaf_kind(ttype)
+            if kind is None or id(leaf) in excluded:
+                parts.append(value)
+            elif kind == 'name':
+                following = leaves[index + 1]
+                # A qualifier such as the "Orders" of "Orders.OrderID" is not a column
+                if following is None or following.ttype is not punctuation_type or following.value != '.':
+                    value = lookup(value, value)
+                parts.append(value)
+            else:
+                # Quoted identifier, the quotes are kept around the hashed name
+                hashed_column_name = lookup(value[1:-1])
+                if hashed_column_name is not None:
+                    value = value[0] + hashed_column_name + value[-1]
+                parts.append(value)
+    return ''.join(parts)
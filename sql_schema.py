@@ -0,0 +1,278 @@
+import re
+
+from sql_hashing import ColumnMapping
+from sql_splitter import split_sql_statements
+
+
+_IDENTIFIER = r"""(?:"(?:[^"]|"")*"|`[^`]*`|\[[^\]]*\]|[\w$]+)"""
+
+_CREATE_TABLE = re.compile(
+    r"CREATE\s+(?:OR\s+REPLACE\s+)?(?:(?:GLOBAL|LOCAL)\s+)?(?:(?:TEMP|TEMPORARY|UNLOGGED)\s+)?"
+    r"TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?(" + _IDENTIFIER + r"(?:\s*\.\s*" + _IDENTIFIER + r")*)\s*\(",
+    re.IGNORECASE)
+
+# Pieces of a CREATE TABLE body: quoted text and comments are kept whole,
+# parentheses and commas decide where a definition ends
+_BODY_TOKEN = re.compile(
+    r"""'(?:[^']|'')*'|"(?:[^"]|"")*"|`[^`]*`|\[[^\]]*\]|--[^\n]*|/\*.*?\*/|[(),]|[^'"`\[(),\-/]+|.""",
+    re.DOTALL)
+
+_FIRST_IDENTIFIER = re.compile(r"\s*(" + _IDENTIFIER + ")")
+
+# Table elements that are not column definitions
+_CONSTRAINT_WORDS = frozenset([
+    'CONSTRAINT', 'PRIMARY', 'FOREIGN', 'UNIQUE', 'CHECK', 'KEY', 'INDEX', 'EXCLUDE', 'LIKE',
+    'FULLTEXT', 'SPATIAL', 'PERIOD',
+])
+
+
+def _unquote(identifier):
+    if identifier[0] == '"':
+        return identifier[1:-1].replace('""', '"')
+    if identifier[0] in '`[':
+        return identifier[1:-1]
+    return identifier
+
+
+def _table_definitions(statement, start):
+    # Comma-separated definitions of the body starting at start, up to the closing parenthesis
+    definitions = []
+    current = []
+    depth = 0
+    for match in _BODY_TOKEN.finditer(statement, start):
+        token = match.group()
+        if token.startswith(('--', '/*')):
+            current.append(' ')
+            continue
+        if token == '(':
+            depth += 1
+        elif token == ')':
+            if depth == 0:
+                break
+            depth -= 1
+        elif token == ',' and depth == 0:
+            definitions.append(''.join(current))
+            current = []
+            continue
+        current.append(token)
+    definitions.append(''.join(current))
+    return definitions
+
+
+def parse_ddl(sql_text):
+    # Table name -> column names, in order, of every CREATE TABLE in sql_text
+    tables = {}
+    for statement in split_sql_statements([sql_text]):
+        match = _CREATE_TABLE.match(statement)
+        if match is None:
+            continue
+        columns = []
+        for definition in _table_definitions(statement, match.end()):
+            name = _FIRST_IDENTIFIER.match(definition)
+            if name is None:
+                continue
+            name = name.group(1)
+            if name[0] not in '"`[' and name.upper() in _CONSTRAINT_WORDS:
+                continue
+            columns.append(_unquote(name))
+        tables[match.group(1)] = columns
+    return tables
+
+
+# Tokens of a query: string literals (1), comments and numbers (2),
+# quoted identifiers (3-5), words (6) and any other single character (7).
+# Quotes follow sqlparse's rules, a backslash-escaped quote does not end a literal.
+_QUERY_TOKEN = re.compile(
+    r"""('(?:''|\\'|[^'])*')|(--[^\n]*|/\*.*?(?:\*/|\Z)|\d[\w.]*)"""
+    r"""|"((?:""|\\"|[^"])*)"|`([^`]*)`|\[([^\]]*)\]|([^\W\d][\w$]*)|(\S)""",
+    re.DOTALL)
+_LITERAL, _SKIPPED, _DOUBLE_QUOTED, _WORD, _OTHER = 1, 2, 3, 6, 7
+
+# A name followed by this is a qualifier, e.g. the alias of "u.name"
+_QUALIFIER_DOT = re.compile(r'\s*\.')
+# A name followed by this is a function, e.g. count(*) or date(created)
+_CALL_PARENTHESIS = re.compile(r'\s*\(')
+# A word followed by this is the type of a literal, e.g. DATE '2024-01-01'
+_TYPED_LITERAL = re.compile(r"\s*'")
+
+# Words followed by a table name
+_TABLE_WORDS = frozenset(['FROM', 'JOIN', 'INTO', 'UPDATE', 'TABLE'])
+
+# Words that can follow a table name without being its alias
+_CLAUSE_WORDS = frozenset([
+    'WHERE', 'ON', 'USING', 'SET', 'VALUES', 'DEFAULT', 'SELECT', 'WITH', 'INNER', 'LEFT', 'RIGHT',
+    'FULL', 'OUTER', 'CROSS', 'NATURAL', 'STRAIGHT_JOIN', 'GROUP', 'ORDER', 'HAVING', 'LIMIT',
+    'OFFSET', 'FETCH', 'UNION', 'INTERSECT', 'EXCEPT', 'RETURNING', 'WINDOW', 'FOR', 'LATERAL',
+    'USE', 'FORCE', 'IGNORE', 'TABLESAMPLE', 'PARTITION',
+])
+
+# Functions whose first argument is a date part keyword, e.g. EXTRACT(YEAR FROM created)
+_DATE_PART_FUNCTIONS = frozenset([
+    'EXTRACT', 'DATEADD', 'DATEDIFF', 'DATEDIFF_BIG', 'DATENAME', 'DATEPART', 'DATETRUNC',
+    'TIMESTAMPADD', 'TIMESTAMPDIFF',
+])
+
+# What the next name of a query is: a column, a table, what follows a
+# table (its alias or a clause), the alias after "table AS", what follows
+# a table alias, a name that is not a column (the alias after any other
+# AS, a type after '::', a date part), or what follows INTERVAL
+_COLUMN, _TABLE, _AFTER_TABLE, _TABLE_ALIAS, _AFTER_ALIAS, _NOT_COLUMN, _INTERVAL = range(7)
+
+# What an open parenthesis is: a group or subquery, the arguments of a
+# function, or those of a _DATE_PART_FUNCTIONS function
+_GROUP, _CALL, _DATE_PART_CALL = range(3)
+
+
+class Schema:
+    # Column names known up front from DDL, hashed once.
+    #
+    # Every query is then anonymized by looking its names up in the
+    # precomputed mapping: nothing is hashed or compiled per query.
+    # Unquoted names are compared case-insensitively, the way the database
+    # resolves them, quoted ones as they are written. Either way the
+    # mapping holds the name as the DDL spells it, the name its hash is
+    # computed from. String literals, comments, table names, aliases, the
+    # qualifier of "alias.column", function names and keywords are never
+    # replaced, nor are names that are not columns of the schema.
+
+    def __init__(self, tables):
+        self.tables = tables
+        hashed_columns = ColumnMapping()
+        for columns in tables.values():
+            hashed_columns.update(dict.fromkeys(columns))
+        self.column_name_mapping = hashed_columns.to_dict()
+        # Case-folded name -> name in the DDL, the first spelling wins
+        self._folded_names = {}
+        for name in self.column_name_mapping:
+            self._folded_names.setdefault(name.casefold(), name)
+
+    def __len__(self):
+        return len(self.column_name_mapping)
+
+    def _columns(self, sql_query):
+        # (start, end, name in the DDL, hashed name) of every schema column
+        # in the query, start and end of the name without its quotes
+        mapping = self.column_name_mapping
+        folded_names = self._folded_names
+        state = _COLUMN
+        # One entry per open parenthesis, and what the next '(' opens
+        parentheses = []
+        opening = _GROUP
+        for match in _QUERY_TOKEN.finditer(sql_query):
+            group = match.lastindex
+            if group == _SKIPPED:
+                if match.group(_SKIPPED)[0] not in '-/':
+                    # A number, e.g. the "1" of INTERVAL 1 DAY
+                    state = _NOT_COLUMN if state == _INTERVAL else _COLUMN
+                continue
+            if group == _LITERAL:
+                state = _NOT_COLUMN if state == _INTERVAL else _COLUMN
+                continue
+            if group == _OTHER:
+                character = match.group(_OTHER)
+                if character == '(':
+                    parentheses.append(opening)
+                    state = _NOT_COLUMN if opening == _DATE_PART_CALL else _COLUMN
+                elif character == ')':
+                    if parentheses:
+                        parentheses.pop()
+                    state = _COLUMN
+                elif character == ',' and state in (_AFTER_TABLE, _AFTER_ALIAS):
+                    # "FROM users u, orders o"
+                    state = _TABLE
+                elif character == ':':
+                    # The type of "x::date", or a ":name" parameter
+                    state = _NOT_COLUMN
+                elif character != '.':
+                    state = _COLUMN
+                opening = _GROUP
+                continue
+            opening = _GROUP
+            name = match.group(group)
+            if group == _WORD:
+                word = name.upper()
+                if word in _TABLE_WORDS:
+                    if parentheses and parentheses[-1] != _GROUP:
+                        # Part of the call, e.g. EXTRACT(YEAR FROM created)
+                        state = _COLUMN
+                    else:
+                        state = _TABLE
+                    continue
+                if word == 'AS':
+                    state = _TABLE_ALIAS if state == _AFTER_TABLE else _NOT_COLUMN
+                    continue
+                if word == 'SELECT' and parentheses:
+                    # A subquery, e.g. EXISTS(SELECT ...)
+                    parentheses[-1] = _GROUP
+                if word == 'INTERVAL':
+                    state = _INTERVAL
+                    continue
+                if state == _AFTER_TABLE and word in _CLAUSE_WORDS:
+                    state = _COLUMN
+            if state == _TABLE:
+                # "schema.table" is a table name as a whole
+                if not _QUALIFIER_DOT.match(sql_query, match.end()):
+                    state = _AFTER_TABLE
+                continue
+            if state in (_AFTER_TABLE, _TABLE_ALIAS):
+                state = _AFTER_ALIAS
+                continue
+            if state == _NOT_COLUMN:
+                state = _COLUMN
+                continue
+            state = _COLUMN
+            if _QUALIFIER_DOT.match(sql_query, match.end()):
+                continue
+            if _CALL_PARENTHESIS.match(sql_query, match.end()):
+                opening = (_DATE_PART_CALL if group == _WORD and name.upper() in _DATE_PART_FUNCTIONS
+                           else _CALL)
+                continue
+            if group == _WORD:
+                if _TYPED_LITERAL.match(sql_query, match.end()):
+                    continue
+                name = folded_names.get(name.casefold())
+            elif group == _DOUBLE_QUOTED:
+                name = name.replace('""', '"')
+            hashed_column_name = mapping.get(name)
+            if hashed_column_name is not None:
+                yield match.start(group), match.end(group), name, hashed_column_name
+
+    def lookup(self, sql_query):
+        # Mapping of the schema columns that appear in the query
+        return {name: hashed_column_name
+                for _, _, name, hashed_column_name in self._columns(sql_query)}
+
+    def anonymize(self, sql_query):
+        # (rewritten query, mapping of the columns it held) in one pass over the tokens
+        parts = []
+        found = {}
+        position = 0
+        for start, end, name, hashed_column_name in self._columns(sql_query):
+            parts.append(sql_query[position:start])
+            parts.append(hashed_column_name)
+            found[name] = hashed_column_name
+            position = end
+        parts.append(sql_query[position:])
+        return ''.join(parts), found
+
+
+def load_schema(path):
+    with open(path, 'r', encoding='utf-8') as ddl_file:
+        return Schema(parse_ddl(ddl_file.read()))
+
+
+# Schema every ParsedQuery of this process uses, None for column discovery
+_active_schema = None
+
+
+def configure_schema(path=None):
+    # Load the DDL in path, or go back to discovering columns with None.
+    # The column names are hashed right away, so call this after
+    # configure_hasher and configure_digests.
+    global _active_schema
+    _active_schema = None if path is None else load_schema(path)
+    return _active_schema
+
+
+def active_schema():
+    return _active_schema
@@ -0,0 +1,260 @@
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from sql_stats import STATS
+from sql_stream import (_anonymize_batch_in_worker, anonymize_batch, init_worker,
+                        iter_jsonl_records, open_mapping_store, worker_initargs)
+
+
+DEFAULT_BATCH_SIZE = 64
+DEFAULT_BATCH_LATENCY = 0.005
+DEFAULT_MAX_PENDING = 1024
+DEFAULT_MAX_IN_FLIGHT = 64
+DEFAULT_MAX_REQUEST_SIZE = 16 * 1024 * 1024
+
+
+class AnonymizerServer:
+    # asyncio front end for the anonymizer.
+    #
+    # Clients send one request per line, either a bare SQL query or a JSON
+    # object holding the query in query_field, and get one JSON line back
+    # per request, in request order. Requests of all connections are
+    # gathered into micro-batches of up to batch_size queries, or whatever
+    # arrived within batch_latency seconds, and every batch runs on the
+    # executor so the event loop never does CPU work itself.
+    #
+    # Backpressure: at most max_pending requests wait for a batch and each
+    # connection has at most max_in_flight unanswered requests. When either
+    # limit is reached the server stops reading from the connection, which
+    # in turn makes the client's writes block. Request lines longer than
+    # max_request_size bytes are skipped and answered with an error.
+
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE, batch_latency=DEFAULT_BATCH_LATENCY,
+                 max_pending=DEFAULT_MAX_PENDING, max_in_flight=DEFAULT_MAX_IN_FLIGHT,
+                 workers=1, query_field='query', rewrite_mode='regex', executor=None,
+                 initializer=None, initargs=(), mapping_store=None,
+                 max_request_size=DEFAULT_MAX_REQUEST_SIZE):
+        self.batch_size = batch_size
+        self.batch_latency = batch_latency
+        self.max_pending = max_pending
+        self.max_in_flight = max_in_flight
+        self.workers = workers
+        self.query_field = query_field
+        self.rewrite_mode = rewrite_mode
+        self.executor = executor
+        self.initializer = initializer
+        self.initargs = initargs
+        self.mapping_store = mapping_store
+        self.max_request_size = max_request_size
+        # Store writes go through one thread, in batch order
+        self._store_executor = None
+        self.batches = 0
+        self.requests = 0
+        self._queue = None
+        self._batch_slots = None
+        self._batcher = None
+        self._server = None
+
+    def _create_executor(self):
+        if self.workers > 1:
+            from concurrent.futures import ProcessPoolExecutor
+            return ProcessPoolExecutor(max_workers=self.workers, initializer=self.initializer,
+                                       initargs=self.initargs)
+        return ThreadPoolExecutor(max_workers=1)
+
+    async def start(self, host='127.0.0.1', port=0, path=None):
+        if self.executor is None:
+            self.executor = self._create_executor()
+        if self.mapping_store is not None:
+            self._store_executor = ThreadPoolExecutor(max_workers=1)
+        self._queue = asyncio.Queue(self.max_pending)
+        # One batch per worker runs at a time, later batches keep gathering
+        self._batch_slots = asyncio.Semaphore(self.workers)
+        self._batcher = asyncio.create_task(self._gather_batches())
+        if path is not None:
+            self._server = await asyncio.start_unix_server(self._handle_connection, path=path,
+                                                           limit=self.max_request_size)
+        else:
+            self._server = await asyncio.start_server(self._handle_connection, host, port,
+                                                      limit=self.max_request_size)
+        return self._server
+
+    @property
+    def address(self):
+        return self._server.sockets[0].getsockname()
+
+    async def serve_forever(self):
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        self._server.close()
+        await self._server.wait_closed()
+        self._batcher.cancel()
+        try:
+            await self._batcher
+        except asyncio.CancelledError:
+            pass
+        self.executor.shutdown(wait=True)
+        if self._store_executor is not None:
+            self._store_executor.shutdown(wait=True)
+
+    async def _submit(self, record, sql_query):
+        # Queue one request, waiting while max_pending requests are queued,
+        # and return the future of its result
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(((record, sql_query), future))
+        return future
+
+    def _parse_request(self, line):
+        if line.startswith('{'):
+            return next(iter_jsonl_records([line], self.query_field))
+        return {}, line
+
+    async def _read_line(self, reader):
+        # The next request line, b'' at the end of the stream and None for a
+        # line over max_request_size, which is dropped up to its newline
+        try:
+            return await reader.readuntil(b'\n')
+        except asyncio.IncompleteReadError as e:
+            # Last line without a newline
+            return e.partial
+        except asyncio.LimitOverrunError as e:
+            consumed = e.consumed
+        # Drop the line in pieces of at most max_request_size bytes
+        while True:
+            try:
+                await reader.readexactly(consumed)
+                await reader.readuntil(b'\n')
+                return None
+            except asyncio.IncompleteReadError:
+                return None
+            except asyncio.LimitOverrunError as e:
+                consumed = e.consumed
+
+    @staticmethod
+    async def _put_response(responses, pending, sender):
+        # Hand pending to the sender, False if the sender has stopped (the
+        # client went away) and would never take it off a full queue
+        if not responses.full():
+            responses.put_nowait(pending)
+            return True
+        put = asyncio.ensure_future(responses.put(pending))
+        await asyncio.wait([put, sender], return_when=asyncio.FIRST_COMPLETED)
+        if put.done():
+            return True
+        put.cancel()
+        return False
+
+    async def _handle_connection(self, reader, writer):
+        responses = asyncio.Queue(self.max_in_flight)
+        sender = asyncio.create_task(self._send_responses(responses, writer))
+        try:
+            while not sender.done():
+                line = await self._read_line(reader)
+                if line is None:
+                    future = asyncio.get_running_loop().create_future()
+                    future.set_result({'error': f"Request longer than {self.max_request_size} bytes",
+                                       'valid': False})
+                elif not line:
+                    break
+                else:
+                    line = line.decode('utf-8').strip()
+                    if not line:
+                        continue
+                    record, sql_query = self._parse_request(line)
+                    # The next line is only read once the request is queued and
+                    # fewer than max_in_flight responses are outstanding
+                    future = await self._submit(record, sql_query)
+                if not await self._put_response(responses, future, sender):
+                    break
+        finally:
+            await self._put_response(responses, None, sender)
+            await sender
+
+    async def _send_responses(self, responses, writer):
+        try:
+            while True:
+                pending = await responses.get()
+                if pending is None:
+                    break
+                try:
+                    result = await pending
+                except Exception as e:
+                    # The worker pool failed, the request is answered anyway
+                    result = {'error': str(e), 'valid': False}
+                writer.write(json.dumps(result).encode('utf-8') + b'\n')
+                await writer.drain()
+        except ConnectionError:
+            # The client went away, nobody is left to answer
+            pass
+        finally:
+            writer.close()
+
+    async def _gather_batches(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.batch_latency
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            await self._batch_slots.acquire()
+            asyncio.create_task(self._run_batch(batch))
+
+    async def _run_batch(self, batch):
+        loop = asyncio.get_running_loop()
+        records = [request for request, future in batch]
+        try:
+            if self.workers > 1:
+                results, batch_mapping, stats_snapshot = await loop.run_in_executor(
+                    self.executor, _anonymize_batch_in_worker, records, self.query_field,
+                    self.rewrite_mode)
+                if stats_snapshot is not None:
+                    STATS.merge(stats_snapshot)
+            else:
+                results, batch_mapping = await loop.run_in_executor(
+                    self.executor, anonymize_batch, records, self.query_field, self.rewrite_mode)
+        except Exception as e:
+            for request, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self._batch_slots.release()
+        self.batches += 1
+        self.requests += len(batch)
+        for (request, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+        if self.mapping_store is not None:
+            await loop.run_in_executor(self._store_executor, self.mapping_store.insert_many,
+                                       batch_mapping)
+
+
+async def _serve(server, host, port, path):
+    await server.start(host, port, path)
+    print(f"Anonymizer listening on {path or server.address}", flush=True)
+    await server.serve_forever()
+
+
+def run_server(args):
+    server = AnonymizerServer(args.max_batch_size, args.max_batch_latency_ms / 1000,
+                              args.max_pending, args.max_in_flight, args.workers,
+                              args.query_field, args.rewrite_mode,
+                              initializer=init_worker, initargs=worker_initargs(args),
+                              mapping_store=open_mapping_store(args.mapping_store),
+                              max_request_size=args.max_request_bytes)
+    try:
+        asyncio.run(_serve(server, args.serve_host, args.serve_port, args.serve_socket))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if server.mapping_store is not None:
+            server.mapping_store.close()
@@ -0,0 +1,196 @@
+import mmap
+import os
+import re
+import stat
+
+
+# Tokens that end a statement or open a section in which ';' means nothing:
+# string literals, quoted identifiers, comments and dollar-quoted bodies
+# ("$$ ... $$", "$body$ ... $body$"). In a string literal a backslash escapes
+# the next character, as in MySQL dumps ('it\'s') and in sqlparse.
+_BOUNDARY = r""";|'|"|`|--|/\*|(?<![\w$])\$(?:[A-Za-z_]\w*)?\$"""
+# End of the text that may be the first characters of a boundary token
+_PARTIAL = r"""(?:-|/|(?<![\w$])\$(?:[A-Za-z_]\w*)?)\Z"""
+# A whole statement up to its ';' in one match, for the common case of
+# quotes and comments that end before the statement does. Every '$' that
+# might open a dollar quote makes it fail and the token loop takes over.
+_STATEMENT = r"""[^;'"`\-/$]*(?:(?:'[^'\\]*(?:\\[\s\S][^'\\]*)*'|"[^"]*"|`[^`]*`|--[^\n]*\n|/\*[^*]*\*+(?:[^/*][^*]*\*+)*/
+                |-(?!-)|/(?!\*)|\$(?!(?:[A-Za-z_]\w*)?\$))[^;'"`\-/$]*)*;"""
+
+# The rest of a string literal: group 1 is the closing quote, missing if
+# the text ends first, in which case the match stops before a backslash
+# whose escaped character has not arrived yet
+_LITERAL_END = r"""[^'\\]*(?:\\[\s\S][^'\\]*)*(')?"""
+
+_TEXT_PATTERNS = (re.compile(_BOUNDARY), re.compile(_PARTIAL), re.compile(_STATEMENT, re.VERBOSE),
+                  re.compile(_LITERAL_END), ';', "'", {'--': '\n', '/*': '*/'})
+_BYTES_PATTERNS = (re.compile(_BOUNDARY.encode()), re.compile(_PARTIAL.encode()),
+                   re.compile(_STATEMENT.encode(), re.VERBOSE), re.compile(_LITERAL_END.encode()),
+                   b';', b"'", {b'--': b'\n', b'/*': b'*/'})
+
+# Pages of a mapped file are given back to the kernel every this many bytes
+_RELEASE_SIZE = 16 * 1024 * 1024
+
+
+class StatementScanner:
+    # Finds the ';' that end SQL statements, in str or bytes, without
+    # stopping inside quotes, comments or dollar-quoted bodies.
+    #
+    # The text can arrive piece by piece: the scanner remembers the section
+    # it is in, and find_end sets resume to where scanning has to go on
+    # once more text is available. A token cut in two by the end of the
+    # text (e.g. the first '-' of '--') is scanned again from its start.
+
+    def __init__(self, binary=False):
+        (self._boundary, self._partial, self._statement, self._literal_end, self._semicolon,
+         self._quote, self._closers) = _BYTES_PATTERNS if binary else _TEXT_PATTERNS
+        # What ends the current section, None outside of one
+        self._closer = None
+        self.resume = 0
+
+    def find_end(self, text, position, final=False):
+        # Index of the ';' ending the statement that text holds from
+        # position on, -1 if the text ends first. final means no more text follows.
+        if self._closer is None:
+            match = self._statement.match(text, position)
+            if match is not None:
+                self.resume = match.end()
+                return match.end() - 1
+        while True:
+            closer = self._closer
+            if closer == self._quote:
+                match = self._literal_end.match(text, position)
+                if match.group(1) is None:
+                    self.resume = match.end()
+                    return -1
+                self._closer = None
+                position = match.end()
+                continue
+            if closer is not None:
+                end = text.find(closer, position)
+                if end < 0:
+                    self.resume = max(position, len(text) - len(closer) + 1)
+                    return -1
+                self._closer = None
+                position = end + len(closer)
+                continue
+            match = self._boundary.search(text, position)
+            if match is None:
+                partial = None if final else self._partial.search(text, position)
+                self.resume = len(text) if partial is None else partial.start()
+                return -1
+            token = match.group()
+            if token == self._semicolon:
+                self.resume = match.end()
+                return match.start()
+            # Quotes and dollar quotes are closed by themselves, a doubled
+            # quote simply closes and reopens the literal
+            self._closer = self._closers.get(token, token)
+            position = match.end()
+
+
+def _code_start(statement):
+    # Index of the first character that is not part of a leading comment,
+    # e.g. the "-- Name: ...; Type: TABLE" lines of a dump before every statement
+    position = 0
+    while position < len(statement):
+        if statement.startswith('--', position):
+            end = statement.find('\n', position)
+            if end < 0:
+                return len(statement)
+            position = end + 1
+        elif statement.startswith('/*', position):
+            end = statement.find('*/', position + 2)
+            if end < 0:
+                return len(statement)
+            position = end + 2
+        elif statement[position].isspace():
+            position += 1
+        else:
+            return position
+    return position
+
+
+def _statement(text):
+    # The statement without surrounding whitespace and leading comments,
+    # None if nothing is left
+    statement = text.strip()
+    if statement.startswith(('--', '/*')):
+        statement = statement[_code_start(statement):]
+    return statement or None
+
+
+def split_sql_statements(chunks):
+    # Split a stream of SQL text on ';'. Only the statement that is
+    # currently being read is kept in memory.
+    scanner = StatementScanner()
+    buffer = ''
+    # Start of the statement being read and where scanning goes on, in buffer
+    start = 0
+    position = 0
+    for chunk in chunks:
+        # Text before start is dropped once per chunk, not once per statement
+        buffer = buffer[start:] + chunk
+        position -= start
+        start = 0
+        while True:
+            end = scanner.find_end(buffer, position)
+            if end < 0:
+                break
+            statement = _statement(buffer[start:end])
+            if statement:
+                yield statement
+            start = position = scanner.resume
+        position = scanner.resume
+    statement = _statement(buffer[start:])
+    if statement:
+        yield statement
+
+
+def _decode(data):
+    # Same text as reading the file in text mode with universal newlines
+    text = data.decode('utf-8')
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return _statement(text)
+
+
+def split_sql_file(sql_file):
+    # Split a regular file on ';' like split_sql_statements, through a
+    # read-only memory map instead of reads. Statements are decoded one at
+    # a time and the pages already scanned are handed back to the kernel,
+    # so memory use follows the largest statement, not the file size.
+    if os.fstat(sql_file.fileno()).st_size == 0:
+        return
+    with mmap.mmap(sql_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        if hasattr(mapped, 'madvise'):
+            mapped.madvise(mmap.MADV_SEQUENTIAL)
+        scanner = StatementScanner(binary=True)
+        start = 0
+        released = 0
+        while True:
+            end = scanner.find_end(mapped, start, final=True)
+            if end < 0:
+                break
+            statement = _decode(mapped[start:end])
+            if statement:
+                yield statement
+            start = scanner.resume
+            if start - released >= _RELEASE_SIZE and hasattr(mmap, 'MADV_DONTNEED'):
+                # The mapping is read-only, dropped pages are read again from the file if needed
+                page_start = start - start % mmap.PAGESIZE
+                mapped.madvise(mmap.MADV_DONTNEED, released, page_start - released)
+                released = page_start
+        statement = _decode(mapped[start:])
+        if statement:
+            yield statement
+
+
+def is_mappable(stream):
+    # True for a regular, non-empty file that has not been read from yet,
+    # e.g. an --input file or stdin redirected from a file
+    try:
+        status = os.fstat(stream.fileno())
+        return stat.S_ISREG(status.st_mode) and status.st_size > 0 and stream.tell() == 0
+    except (OSError, ValueError):
+        return False
@@ -0,0 +1,228 @@
+import json
+import sys
+import time
+from contextlib import nullcontext
+
+from sql_lazy import lazy_import
+
+# Only needed with --trace-memory
+tracemalloc = lazy_import('tracemalloc')
+
+
+# Shared by every disabled timer, entering it costs next to nothing
+_NULL_CONTEXT = nullcontext()
+
+# Stages in pipeline order, used to order the summary
+STAGES = ('query', 'fast_parse', 'tokenize', 'validate', 'walk', 'hash', 'rewrite')
+
+
+class _StageTimer:
+    __slots__ = ('stats', 'name', 'started')
+
+    def __init__(self, stats, name):
+        self.stats = stats
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stats.record(self.name, time.perf_counter() - self.started)
+        return False
+
+
+class _QueryContext(_StageTimer):
+    __slots__ = ('profiler',)
+
+    def __init__(self, stats, profiler):
+        super().__init__(stats, 'query')
+        self.profiler = profiler
+
+    def __enter__(self):
+        if self.profiler is not None:
+            self.profiler.enable()
+        return super().__enter__()
+
+    def __exit__(self, *exc_info):
+        super().__exit__(*exc_info)
+        if self.profiler is not None:
+            self.profiler.disable()
+            self.stats.add_profile(self.profiler)
+        self.stats.incr('queries')
+        self.stats.maybe_dump()
+        return False
+
+
+class Stats:
+    # Per-stage timers with log2 latency histograms plus plain counters.
+    # Everything is a no-op until enable() is called; hot paths check
+    # STATS.enabled themselves before doing any bookkeeping.
+
+    def __init__(self):
+        self.enabled = False
+        self.profile_every = 0
+        self.dump_path = None
+        self.dump_interval = None
+        self._next_dump = None
+        self._profile = None
+        self.reset()
+
+    def reset(self):
+        self.counters = {}
+        # name -> [count, total seconds, max seconds, {bucket: count}]
+        self.timers = {}
+
+    def enable(self, profile_every=0, dump_path=None, dump_interval=None, trace_memory=False):
+        self.enabled = True
+        self.profile_every = profile_every
+        self.dump_path = dump_path
+        self.dump_interval = dump_interval
+        if dump_path and dump_interval:
+            self._next_dump = time.monotonic() + dump_interval
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def disable(self):
+        self.enabled = False
+
+    def incr(self, name, amount=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def time(self, name):
+        if not self.enabled:
+            return _NULL_CONTEXT
+        return _StageTimer(self, name)
+
+    def query(self):
+        # Wraps the processing of one query: times it, counts it and
+        # runs every profile_every-th query under cProfile
+        if not self.enabled:
+            return _NULL_CONTEXT
+        profiler = None
+        if self.profile_every and self.counters.get('queries', 0) % self.profile_every == 0:
+            import cProfile
+            profiler = cProfile.Profile()
+        return _QueryContext(self, profiler)
+
+    def record(self, name, seconds):
+        timer = self.timers.get(name)
+        if timer is None:
+            timer = self.timers[name] = [0, 0.0, 0.0, {}]
+        timer[0] += 1
+        timer[1] += seconds
+        if seconds > timer[2]:
+            timer[2] = seconds
+        # Bucket n holds latencies below 2**n microseconds
+        bucket = int(seconds * 1000000).bit_length()
+        timer[3][bucket] = timer[3].get(bucket, 0) + 1
+
+    def add_profile(self, profiler):
+        import pstats
+
+        if self._profile is None:
+            self._profile = pstats.Stats(profiler)
+        else:
+            self._profile.add(profiler)
+
+    def snapshot(self, reset=False):
+        snapshot = {
+            'counters': dict(self.counters),
+            'timers': {
+                name: {
+                    'count': timer[0],
+                    'total_seconds': timer[1],
+                    'max_seconds': timer[2],
+                    'histogram': {str(bucket): count for bucket, count in sorted(timer[3].items())},
+                }
+                for name, timer in self.timers.items()
+            },
+        }
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            snapshot['memory'] = {'current_bytes': current, 'peak_bytes': peak}
+        if reset:
+            self.reset()
+        return snapshot
+
+    def merge(self, snapshot):
+        # Add a snapshot taken in a worker process
+        for name, amount in snapshot['counters'].items():
+            self.counters[name] = self.counters.get(name, 0) + amount
+        for name, other in snapshot['timers'].items():
+            timer = self.timers.get(name)
+            if timer is None:
+                timer = self.timers[name] = [0, 0.0, 0.0, {}]
+            timer[0] += other['count']
+            timer[1] += other['total_seconds']
+            timer[2] = max(timer[2], other['max_seconds'])
+            for bucket, count in other['histogram'].items():
+                timer[3][int(bucket)] = timer[3].get(int(bucket), 0) + count
+
+    def maybe_dump(self):
+        if self._next_dump is not None and time.monotonic() >= self._next_dump:
+            self.dump()
+            self._next_dump = time.monotonic() + self.dump_interval
+
+    def dump(self):
+        if self.dump_path:
+            with open(self.dump_path, 'w', encoding='utf-8') as dump_file:
+                json.dump(self.snapshot(), dump_file, indent=4)
+
+    def save_profile(self, path):
+        if self._profile is not None:
+            self._profile.dump_stats(path)
+
+    def summary(self):
+        lines = ['------------------------------------', '****** Stats ******',
+                 '------------------------------------']
+        names = [name for name in STAGES if name in self.timers]
+        names += sorted(name for name in self.timers if name not in STAGES)
+        for name in names:
+            count, total, maximum, histogram = self.timers[name]
+            lines.append(f"{name:<10} count={count:<8} total={total:.3f}s "
+                         f"mean={total / count * 1000:.3f}ms max={maximum * 1000:.3f}ms "
+                         f"p50<{_histogram_percentile(histogram, count, 0.50)}us "
+                         f"p99<{_histogram_percentile(histogram, count, 0.99)}us")
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"{name:<30} {value}")
+        for name, value in self._derived():
+            lines.append(f"{name:<30} {value}")
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            lines.append(f"{'memory_peak_bytes':<30} {peak}")
+        lines.append('------------------------------------')
+        return '\n'.join(lines)
+
+    def _derived(self):
+        # Hit rate of every cache counted as <cache>_hits / <cache>_misses
+        counters = self.counters
+        for name in sorted(counters):
+            if name.endswith('_hits') and name[:-5] + '_misses' in counters:
+                hits = counters[name]
+                lookups = hits + counters[name[:-5] + '_misses']
+                yield name[:-5] + '_hit_rate', f"{hits / lookups:.1%}"
+        # Validations skipped by the cache or the pre-check, at the mean cost of one that ran
+        skipped = counters.get('validation_cache_hits', 0) + counters.get('precheck_rejections', 0)
+        validate = self.timers.get('validate')
+        if skipped and validate:
+            yield 'validation_seconds_saved', f"~{skipped * validate[1] / validate[0]:.3f}"
+
+    def report(self, stream=None):
+        print(self.summary(), file=stream or sys.stderr)
+        self.dump()
+
+
+def _histogram_percentile(histogram, count, fraction):
+    # Upper bound in microseconds of the bucket holding the percentile
+    seen = 0
+    for bucket in sorted(histogram):
+        seen += histogram[bucket]
+        if seen >= fraction * count:
+            return 2 ** bucket
+    return 0
+
+
+# Process-wide instance used by the pipeline
+STATS = Stats()
@@ -0,0 +1,293 @@
+import json
+import sys
+from collections import deque
+
+from sql_cache import DEFAULT_VALIDATION_CACHE_SIZE, configure_caches
+from sql_hashing import (DEFAULT_DIGEST_ENCODING, DEFAULT_HASH_ALGORITHM, ColumnMapping,
+                         DigestCollisionError, configure_digests, configure_hasher)
+from sql_parser import ParsedQuery
+from sql_schema import configure_schema
+from sql_splitter import is_mappable, split_sql_file, split_sql_statements
+from sql_stats import STATS
+
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+DEFAULT_BATCH_SIZE = 1000
+
+
+def read_chunks(stream, chunk_size=DEFAULT_CHUNK_SIZE):
+    # Read a text stream in bounded-size pieces
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+def iter_sql_records(stream, chunk_size=DEFAULT_CHUNK_SIZE):
+    # Plain SQL input: every statement becomes its own record. Files are
+    # memory-mapped, pipes are read chunk_size characters at a time.
+    if is_mappable(stream):
+        statements = split_sql_file(stream)
+    else:
+        statements = split_sql_statements(read_chunks(stream, chunk_size))
+    for sql_query in statements:
+        yield {}, sql_query
+
+
+def iter_jsonl_records(stream, query_field='query'):
+    # JSONL input: one JSON object per line, the query is read from query_field
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield {}, None
+            continue
+        if not isinstance(record, dict) or not isinstance(record.get(query_field), str):
+            yield record if isinstance(record, dict) else {}, None
+            continue
+        yield record, record[query_field]
+
+
+def anonymize_query(sql_query, rewrite_mode='regex'):
+    # Run one query through the same pipeline as the interactive loop
+    if sql_query is None:
+        return None, {}, False
+    with STATS.query():
+        try:
+            parsed_query = ParsedQuery(sql_query, rewrite_mode=rewrite_mode)
+            if not parsed_query.is_processable:
+                return None, {}, False
+            return parsed_query.modified_sql, parsed_query.column_name_mapping, True
+        except DigestCollisionError:
+            # Not a problem of this query: the digest settings cannot
+            # anonymize the input, so the whole run stops
+            raise
+        except Exception as e:
+            return None, {}, False
+
+
+def anonymize_records(records, query_field='query', rewrite_mode='regex'):
+    # Build the output record: the input record with the query rewritten
+    for record, sql_query in records:
+        modified_sql, column_name_mapping, valid = anonymize_query(sql_query, rewrite_mode)
+        result = dict(record)
+        result[query_field] = modified_sql
+        result['column_name_mapping'] = column_name_mapping
+        result['valid'] = valid
+        yield result
+
+
+def iter_batches(records, batch_size=DEFAULT_BATCH_SIZE):
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def anonymize_batch(batch, query_field='query', rewrite_mode='regex'):
+    # Unit of work for a worker process: the results of one batch plus
+    # the column mapping of the whole batch
+    results = list(anonymize_records(batch, query_field, rewrite_mode))
+    batch_mapping = {}
+    for result in results:
+        batch_mapping.update(result['column_name_mapping'])
+    return results, batch_mapping
+
+
+def init_worker(hash_cache_size, fingerprint_cache_size, preload_mapping=None,
+                stats_enabled=False, validation_cache_size=DEFAULT_VALIDATION_CACHE_SIZE,
+                digest_encoding=DEFAULT_DIGEST_ENCODING, digest_length=None,
+                hash_algorithm=DEFAULT_HASH_ALGORITHM, hash_digest_size=None, hash_key=None,
+                schema_path=None):
+    # Worker processes get the same cache, hash, digest and schema settings as the parent
+    configure_hasher(hash_algorithm, hash_digest_size, hash_key)
+    configure_digests(digest_encoding, digest_length)
+    configure_schema(schema_path)
+    configure_caches(hash_cache_size, fingerprint_cache_size, preload_mapping,
+                     validation_cache_size)
+    if stats_enabled:
+        STATS.enable()
+
+
+def worker_initargs(args):
+    # Arguments of init_worker for the command line options in args
+    return (args.hash_cache_size, args.fingerprint_cache_size, args.preload_mapping,
+            STATS.enabled, args.validation_cache_size, args.digest_encoding, args.digest_length,
+            args.hash_algorithm, args.hash_digest_size, args.hash_key, args.schema)
+
+
+def _anonymize_batch_in_worker(batch, query_field, rewrite_mode):
+    # The stats of the batch travel back with its results, the parent merges them
+    results, batch_mapping = anonymize_batch(batch, query_field, rewrite_mode)
+    return results, batch_mapping, STATS.snapshot(reset=True) if STATS.enabled else None
+
+
+def anonymize_batches(records, query_field='query', batch_size=DEFAULT_BATCH_SIZE,
+                      workers=1, column_name_mapping=None, initializer=None, initargs=(),
+                      rewrite_mode='regex', mapping_store=None):
+    # Anonymize records batch by batch, in input order. With more than one
+    # worker the batches run on a process pool; only a few batches per
+    # worker are in flight at a time so memory stays bounded. The mapping
+    # of every batch is also written to mapping_store, if there is one.
+    if column_name_mapping is None:
+        column_name_mapping = {}
+    batches = iter_batches(records, batch_size)
+    if workers <= 1:
+        for batch in batches:
+            results, batch_mapping = anonymize_batch(batch, query_field, rewrite_mode)
+            column_name_mapping.update(batch_mapping)
+            if mapping_store is not None:
+                mapping_store.insert_many(batch_mapping)
+            yield from results
+        return
+
+    # multiprocessing is only imported when a pool is actually used
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=initializer,
+                             initargs=initargs) as executor:
+        pending = deque()
+        for batch in batches:
+            pending.append(executor.submit(
+                _anonymize_batch_in_worker, batch, query_field, rewrite_mode))
+            if len(pending) >= workers * 2:
+                yield from _collect_batch(pending.popleft(), column_name_mapping, mapping_store)
+        while pending:
+            yield from _collect_batch(pending.popleft(), column_name_mapping, mapping_store)
+
+
+def _collect_batch(future, column_name_mapping, mapping_store=None):
+    # The parent is the only writer of the mapping store
+    results, batch_mapping, stats_snapshot = future.result()
+    column_name_mapping.update(batch_mapping)
+    if mapping_store is not None:
+        mapping_store.insert_many(batch_mapping)
+    if stats_snapshot is not None:
+        STATS.merge(stats_snapshot)
+    return results
+
+
+def write_jsonl(results, output, batch_size=DEFAULT_BATCH_SIZE):
+    # Write the results as JSONL, batch_size lines at a time
+    count = 0
+    lines = []
+    for result in results:
+        lines.append(json.dumps(result))
+        count += 1
+        if len(lines) >= batch_size:
+            output.write('\n'.join(lines) + '\n')
+            lines = []
+    if lines:
+        output.write('\n'.join(lines) + '\n')
+    output.flush()
+    return count
+
+
+def anonymize_stream(input_stream, output_stream, input_format='sql', query_field='query',
+                     batch_size=DEFAULT_BATCH_SIZE, chunk_size=DEFAULT_CHUNK_SIZE,
+                     workers=1, column_name_mapping=None, initializer=None, initargs=(),
+                     rewrite_mode='regex', mapping_store=None):
+    if input_format == 'jsonl':
+        records = iter_jsonl_records(input_stream, query_field)
+    else:
+        records = iter_sql_records(input_stream, chunk_size)
+    results = anonymize_batches(records, query_field, batch_size, workers, column_name_mapping,
+                                initializer, initargs, rewrite_mode, mapping_store)
+    return write_jsonl(results, output_stream, batch_size)
+
+
+def serve_lines(input_stream, output_stream, query_field='query', rewrite_mode='regex',
+                mapping_store=None):
+    # Warm line protocol: one request per line, one JSON response per line,
+    # flushed right away. A request is either a bare SQL query or a JSON
+    # object holding the query in query_field. Keeping one process around
+    # saves callers the interpreter and import startup on every query.
+    count = 0
+    for line in input_stream:
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith('{'):
+            records = iter_jsonl_records([line], query_field)
+        else:
+            records = [({}, line)]
+        for result in anonymize_records(records, query_field, rewrite_mode):
+            if mapping_store is not None:
+                mapping_store.insert_many(result['column_name_mapping'])
+            output_stream.write(json.dumps(result) + '\n')
+            output_stream.flush()
+            count += 1
+    return count
+
+
+def open_input(path):
+    if path == '-':
+        return sys.stdin
+    return open(path, 'r', encoding='utf-8')
+
+
+def open_output(path):
+    if path == '-':
+        return sys.stdout
+    return open(path, 'w', encoding='utf-8')
+
+
+def open_mapping_store(path):
+    if path is None:
+        return None
+    # sqlite3 is only imported when a store is used
+    from sql_mapping_store import MappingStore, MappingStoreMismatchError
+    mapping_store = MappingStore(path)
+    try:
+        # Connect right away so a store written with other hash or digest
+        # settings is refused before any output is written
+        mapping_store.connection
+    except MappingStoreMismatchError as error:
+        raise SystemExit(f"Error: {error}")
+    return mapping_store
+
+
+def run_serve(args):
+    mapping_store = open_mapping_store(args.mapping_store)
+    try:
+        return serve_lines(sys.stdin, sys.stdout, args.query_field, args.rewrite_mode,
+                           mapping_store)
+    finally:
+        if mapping_store is not None:
+            mapping_store.close()
+
+
+def run_batch(args):
+    input_format = args.format
+    if input_format is None:
+        # Guess the format from the file extension, stdin defaults to plain SQL
+        input_format = 'jsonl' if args.input.endswith(('.jsonl', '.ndjson')) else 'sql'
+    column_name_mapping = ColumnMapping()
+    mapping_store = open_mapping_store(args.mapping_store)
+    input_stream = open_input(args.input)
+    output_stream = open_output(args.output)
+    try:
+        count = anonymize_stream(input_stream, output_stream, input_format, args.query_field,
+                                 args.batch_size, args.chunk_size, args.workers,
+                                 column_name_mapping, init_worker, worker_initargs(args),
+                                 args.rewrite_mode, mapping_store)
+    finally:
+        if input_stream is not sys.stdin:
+            input_stream.close()
+        if output_stream is not sys.stdout:
+            output_stream.close()
+        if mapping_store is not None:
+            mapping_store.close()
+    if args.mapping_output:
+        # The merged mapping of every query in the input
+        with open(args.mapping_output, 'w', encoding='utf-8') as mapping_file:
+            json.dump(column_name_mapping.to_dict(), mapping_file, indent=4)
+    return count
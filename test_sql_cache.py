@@ -0,0 +1,110 @@
+import unittest
+import hashlib
+import json
+import os
+import tempfile
+from sql_cache import LRUCache, column_hash_cache, preload_column_hash_cache, query_fingerprint
+from sql_parser import ParsedQuery, map_original_hashed_column_name
+
+
+class TestLRUCache(unittest.TestCase):
+    def test_lru_eviction(self):
+        cache = LRUCache(2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        self.assertEqual(cache.get("a"), 1)
+        cache.put("c", 3)
+        self.assertNotIn("b", cache)
+        self.assertIn("a", cache)
+        self.assertEqual(cache.evictions, 1)
+
+    def test_lru_stats(self):
+        cache = LRUCache(10)
+        cache.put("a", 1)
+        cache.get("a")
+        cache.get("b")
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["size"]), (1, 1, 1))
+        self.assertEqual(stats["hit_rate"], 0.5)
+
+    def test_lru_disabled(self):
+        cache = LRUCache(0)
+        cache.put("a", 1)
+        self.assertEqual(len(cache), 0)
+
+
+class TestColumnHashCache(unittest.TestCase):
+    def setUp(self):
+        column_hash_cache.clear()
+
+    def tearDown(self):
+        column_hash_cache.clear()
+
+    def test_column_hash_cache_hit(self):
+        map_original_hashed_column_name("Country", {})
+        column_name_mapping = {}
+        map_original_hashed_column_name("Country", column_name_mapping)
+        self.assertEqual(column_name_mapping, {
+            "Country": hashlib.sha256("Country".encode()).hexdigest(),
+        })
+        self.assertEqual((column_hash_cache.hits, column_hash_cache.misses), (1, 1))
+
+    def test_preload_column_hash_cache(self):
+        mapping = {"Country": hashlib.sha256("Country".encode()).hexdigest()}
+        with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as mapping_file:
+            json.dump(mapping, mapping_file)
+        try:
+            self.assertEqual(preload_column_hash_cache(mapping_file.name), 1)
+        finally:
+            os.remove(mapping_file.name)
+        column_name_mapping = {}
+        map_original_hashed_column_name("Country", column_name_mapping)
+        self.assertEqual(column_name_mapping, mapping)
+        self.assertEqual(column_hash_cache.misses, 0)
+
+
+class TestQueryFingerprint(unittest.TestCase):
+    def test_query_fingerprint_strips_literals(self):
+        self.assertEqual(
+            query_fingerprint("SELECT a1 FROM t WHERE b = 'x''y' AND c > -12.5  AND d IN (1, 2)"),
+            "SELECT a1 FROM t WHERE b = ? AND c > ? AND d IN (?, ?)")
+
+    def test_query_fingerprint_keeps_quoted_identifiers(self):
+        self.assertNotEqual(query_fingerprint('SELECT "a" FROM t'),
+                            query_fingerprint('SELECT "b" FROM t'))
+        self.assertNotEqual(query_fingerprint("SELECT `col 1` FROM t"),
+                            query_fingerprint("SELECT `col 2` FROM t"))
+        self.assertNotEqual(query_fingerprint("SELECT [col 1] FROM t"),
+                            query_fingerprint("SELECT [col 2] FROM t"))
+
+    def test_query_fingerprint_keeps_comments(self):
+        # A quote in a comment must not turn the SQL after it into a literal
+        self.assertEqual(query_fingerprint("SELECT a -- it's\n, salary FROM t WHERE c = 'x'"),
+                         "SELECT a -- it's\n, salary FROM t WHERE c = ?")
+        self.assertNotEqual(query_fingerprint("SELECT a /* 1 */ FROM t"),
+                            query_fingerprint("SELECT a /* 2 */ FROM t"))
+        # What a line comment hides is not the same query as the SQL on the next line
+        self.assertNotEqual(query_fingerprint("SELECT a -- x\n, b FROM t"),
+                            query_fingerprint("SELECT a -- x , b FROM t"))
+
+    def test_query_fingerprint_keeps_digits_of_names(self):
+        for first, second in [("salary$1", "salary$2"), ("a#1", "a#2"), ("@v1", "@v2")]:
+            self.assertNotEqual(query_fingerprint("SELECT %s FROM t" % first),
+                                query_fingerprint("SELECT %s FROM t" % second))
+        first = ParsedQuery("SELECT salary$1 FROM t")
+        self.assertEqual(list(first.column_name_mapping), ["salary$1"])
+        second = ParsedQuery("SELECT salary$2 FROM t")
+        self.assertEqual(second.modified_sql, "SELECT %s FROM t" % hashlib.sha256(b"salary$2").hexdigest())
+
+    def test_query_fingerprint_follows_backslash_escapes(self):
+        # sqlparse reads 'p\' AND y = ' as one literal, so salary and ssn are columns
+        template = r"SELECT a FROM t WHERE x = 'p\' AND y = 'q' AND k = '%s' AND z = 1"
+        self.assertNotEqual(query_fingerprint(template % "salary"), query_fingerprint(template % "ssn"))
+        self.assertIn("salary", ParsedQuery(template % "salary").column_name_mapping)
+        self.assertIn("ssn", ParsedQuery(template % "ssn").column_name_mapping)
+        self.assertEqual(query_fingerprint(r"SELECT a FROM t WHERE b = 'it\'s' AND c = 'x'"),
+                         "SELECT a FROM t WHERE b = ? AND c = ?")
+
+
+if __name__ == "__main__":
+    unittest.main()
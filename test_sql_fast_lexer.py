@@ -0,0 +1,58 @@
+import unittest
+from bench.corpus import CORPORA
+from sql_fast_lexer import fast_parse
+from sql_parser import ParsedQuery
+
+
+FAST_QUERIES = [
+    "SELECT * FROM table1 WHERE column1 = 'value';",
+    "SELECT name, age FROM user WHERE age > 18 And father_name = 'abc'",
+    "INSERT INTO Customers (CustomerName, ContactName) VALUES ('Cardinal','Tom B. Erichsen');",
+    "INSERT INTO t VALUES (1, 2), (3, -4)",
+    "UPDATE Customers SET ContactName='Alfred Schmidt', City='Frankfurt' WHERE CustomerID=1;",
+    "DELETE FROM Customers WHERE CustomerName='Alfreds Futterkiste';",
+    "SELECT t.a, b FROM t INNER JOIN u ON t.id = u.id2 WHERE c = 'x' AND d IS NOT NULL",
+    "SELECT t.a FROM t LEFT OUTER JOIN u ON t.id = u.id FULL JOIN v ON v.x = u.y",
+    "SELECT a FROM t WHERE b NOT IN (1, 2) GROUP BY a ORDER BY a ASC, b DESC LIMIT 10",
+    "SELECT a FROM user WHERE user.name = -1.5e3 OR c <> b - 1",
+]
+
+FALLBACK_QUERIES = [
+    "SELECT a * b FROM t",
+    "SELECT a b FROM t",
+    "SELECT a AS b FROM t",
+    "SELECT COUNT(a) FROM t",
+    "SELECT DISTINCT a FROM t",
+    "SELECT a FROM t; SELECT b FROM u",
+    "SELECT a FROM t -- comment",
+    'SELECT "a" FROM t',
+    "SELECT a FROM t WHERE b IN (SELECT c FROM u)",
+    "SELECT a FROM t NATURAL JOIN u",
+    "WITH x AS (SELECT a FROM t) SELECT a FROM x",
+]
+
+
+class TestFastLexer(unittest.TestCase):
+    def assertMatchesSqlparse(self, sql_query):
+        statement_type, column_names = fast_parse(sql_query)
+        parsed_query = ParsedQuery(sql_query, use_cache=False, use_fast_path=False)
+        self.assertEqual(statement_type, parsed_query.statement_type, sql_query)
+        self.assertEqual(list(dict.fromkeys(column_names)), list(parsed_query.column_name_mapping),
+                         sql_query)
+
+    def test_simple_statements_match_sqlparse(self):
+        for sql_query in FAST_QUERIES:
+            self.assertMatchesSqlparse(sql_query)
+
+    def test_other_statements_fall_back(self):
+        for sql_query in FALLBACK_QUERIES:
+            self.assertIsNone(fast_parse(sql_query), sql_query)
+
+    def test_benchmark_corpora_match_sqlparse(self):
+        for kind in ("simple", "joins", "dml", "templated"):
+            for sql_query in CORPORA[kind](50, 1):
+                self.assertMatchesSqlparse(sql_query)
+
+
+if __name__ == '__main__':
+    unittest.main()
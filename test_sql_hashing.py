@@ -0,0 +1,152 @@
+import unittest
+import hashlib
+import hmac
+import io
+import os
+import tempfile
+from sql_cache import column_hash_cache
+from sql_hashing import (ColumnMapping, DigestCollisionError, Hasher, column_digest,
+                         configure_digests, configure_hasher, decode_digest, encode_digest)
+from sql_parser import (hash_column_names, main, map_original_hashed_column_name, modified_query,
+                        read_hash_key)
+from sql_stream import anonymize_stream
+
+
+class TestDigests(unittest.TestCase):
+    def tearDown(self):
+        configure_hasher()
+        configure_digests()
+        column_hash_cache.clear()
+
+    def test_encodings(self):
+        digest = column_digest("name")
+        self.assertEqual(encode_digest(digest), hashlib.sha256(b"name").hexdigest())
+        for encoding, length in [("hex", 64), ("base32", 52), ("base64url", 43)]:
+            configure_digests(encoding)
+            encoded = encode_digest(digest)
+            self.assertEqual(len(encoded), length)
+            self.assertEqual(decode_digest(encoded), digest)
+
+    def test_truncated_digests(self):
+        configure_digests("base32", 12)
+        column_name_mapping = hash_column_names("SELECT name, age FROM user WHERE age > 18")
+        self.assertEqual([len(hashed) for hashed in column_name_mapping.values()], [12, 12])
+        self.assertEqual(modified_query("SELECT name FROM user", column_name_mapping),
+                         "SELECT " + column_name_mapping["name"] + " FROM user")
+        self.assertIsNone(decode_digest(column_name_mapping["name"]))
+
+    def test_collision_detection(self):
+        # 17 names cannot have 17 different one-character hex names
+        configure_digests("hex", 1)
+        column_name_mapping = ColumnMapping()
+        with self.assertRaises(DigestCollisionError):
+            for index in range(17):
+                column_name_mapping.update({"column_%d" % index: None})
+
+    def test_colliding_name_is_not_cached(self):
+        configure_digests("hex", 1)
+        seen = {}
+        for index in range(17):
+            name = "column_%d" % index
+            if encode_digest(column_digest(name)) in seen.values():
+                break
+            map_original_hashed_column_name(name, seen)
+        with self.assertRaises(DigestCollisionError):
+            map_original_hashed_column_name(name, {})
+        self.assertNotIn(name, column_hash_cache)
+        with self.assertRaises(DigestCollisionError):
+            map_original_hashed_column_name(name, {})
+
+    def test_collision_stops_the_stream(self):
+        configure_digests("hex", 1)
+        queries = ";".join("SELECT column_%d FROM t" % index for index in range(40))
+        output = io.StringIO()
+        with self.assertRaises(DigestCollisionError):
+            anonymize_stream(io.StringIO(queries), output, "sql", batch_size=1)
+        self.assertNotIn("null", output.getvalue())
+
+    def test_collision_exits_cleanly(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "queries.sql")
+            with open(path, "w", encoding="utf-8") as sql_file:
+                sql_file.write(";".join("SELECT column_%d FROM t" % index for index in range(40)))
+            with self.assertRaises(SystemExit) as raised:
+                main(["--input", path, "--output", os.path.join(directory, "out.jsonl"),
+                      "--digest-length", "1", "--batch-size", "1"])
+        self.assertIn("both hash to", str(raised.exception))
+
+    def test_invalid_digest_length_exits_cleanly(self):
+        for length in ("0", "-4"):
+            with self.assertRaises(SystemExit) as raised:
+                main(["--digest-length", length, "--input", "-"])
+            self.assertEqual(str(raised.exception), "Digest length must be positive: %s" % length)
+
+    def test_column_mapping(self):
+        column_name_mapping = ColumnMapping()
+        column_name_mapping.update(hash_column_names("SELECT name, age FROM user"))
+        column_name_mapping.update(hash_column_names("SELECT name FROM user"))
+        self.assertEqual(column_name_mapping, {
+            "name": hashlib.sha256(b"name").hexdigest(),
+            "age": hashlib.sha256(b"age").hexdigest(),
+        })
+        self.assertEqual(column_name_mapping.to_dict(), dict(column_name_mapping))
+
+
+class TestHashers(unittest.TestCase):
+    def tearDown(self):
+        configure_hasher()
+        column_hash_cache.clear()
+
+    def test_backends(self):
+        key = b"secret"
+        expected = {
+            ("sha256", None, None): hashlib.sha256(b"name").digest(),
+            ("blake2b", None, None): hashlib.blake2b(b"name", digest_size=32).digest(),
+            ("blake2s", 16, None): hashlib.blake2s(b"name", digest_size=16).digest(),
+            ("hmac-sha256", None, key): hmac.new(key, b"name", hashlib.sha256).digest(),
+            ("blake2b-keyed", 20, key): hashlib.blake2b(b"name", key=key, digest_size=20).digest(),
+        }
+        for (algorithm, digest_size, hash_key), digest in expected.items():
+            hasher = Hasher(algorithm, digest_size, hash_key)
+            self.assertEqual(hasher.digest_size, len(digest))
+            # The prebuilt hash object is not changed by hashing a name
+            self.assertEqual(hasher.digest("name"), digest)
+            self.assertEqual(hasher.digest("name"), digest)
+
+    def test_invalid_settings(self):
+        for algorithm, digest_size, key in [("md5", None, None), ("hmac-sha256", None, None),
+                                            ("blake2b", None, b"key"), ("sha256", 16, None)]:
+            with self.assertRaises(ValueError):
+                Hasher(algorithm, digest_size, key)
+
+    def test_zero_digest_size_is_rejected(self):
+        for algorithm, key in [("blake2s", None), ("blake2b", None), ("blake2b-keyed", b"key")]:
+            with self.assertRaisesRegex(ValueError, "digest_size must be between 1"):
+                Hasher(algorithm, 0, key)
+        with self.assertRaisesRegex(SystemExit, "digest_size must be between 1"):
+            main(["--hash-algorithm", "blake2b", "--hash-digest-size", "0", "--input", "-"])
+
+    def test_read_hash_key_keeps_binary_bytes(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "key")
+            for content, key in [(b"secret\n", b"secret"), (b"secret\r\n", b"secret"),
+                                 (b" \tkey\x00\x0b\n\n", b" \tkey\x00\x0b\n"), (b"\nkey ", b"\nkey ")]:
+                with open(path, "wb") as key_file:
+                    key_file.write(content)
+                self.assertEqual(read_hash_key(path), key)
+
+    def test_configure_hasher(self):
+        self.assertEqual(hash_column_names("SELECT name FROM user")["name"],
+                         hashlib.sha256(b"name").hexdigest())
+        configure_hasher("hmac-sha256", key=b"secret")
+        # Digests cached with the previous hasher are dropped
+        self.assertEqual(len(column_hash_cache), 0)
+        hashed_name = hash_column_names("SELECT name FROM user")["name"]
+        self.assertEqual(hashed_name, hmac.new(b"secret", b"name", hashlib.sha256).hexdigest())
+        configure_hasher("blake2b", 16)
+        self.assertEqual(len(hash_column_names("SELECT name FROM user")["name"]), 32)
+        self.assertIsNotNone(decode_digest(column_digest("name").hex()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import unittest
+import hashlib
+import io
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from sql_hashing import configure_digests, configure_hasher
+from sql_mapping_store import MappingStore, MappingStoreMismatchError, deanonymize_query
+from sql_stream import anonymize_stream, open_mapping_store
+
+
+def _lookup_in_worker(mapping_store, names):
+    return mapping_store.lookup_many(names)
+
+
+class TestMappingStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "mapping.sqlite")
+        self.store = MappingStore(self.path)
+
+    def tearDown(self):
+        self.store.close()
+        self.directory.cleanup()
+        configure_digests()
+        configure_hasher()
+
+    def test_insert_and_lookup(self):
+        self.assertEqual(self.store.insert_many({"name": "h1", "age": "h2"}), 2)
+        # Names this process already wrote are skipped
+        self.assertEqual(self.store.insert_many({"name": "h1"}), 0)
+        self.assertEqual(self.store.lookup_many(["name", "age", "city"]), {"name": "h1", "age": "h2"})
+        self.assertEqual(self.store.reverse_lookup("h2"), "age")
+        self.assertIsNone(self.store.lookup("city"))
+        self.assertEqual(len(self.store), 2)
+
+    def test_lookup_many_chunks(self):
+        mapping = {"column_%d" % index: "hash_%d" % index for index in range(1200)}
+        self.store.insert_many(mapping)
+        self.assertEqual(self.store.lookup_many(mapping), mapping)
+
+    def test_survives_reopen_and_is_shared_with_workers(self):
+        self.store.insert_many({"name": "h1"})
+        self.store.close()
+        reader = MappingStore(self.path, readonly=True)
+        self.assertEqual(reader.lookup("name"), "h1")
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            self.assertEqual(executor.submit(_lookup_in_worker, reader, ["name"]).result(),
+                             {"name": "h1"})
+        reader.close()
+
+    def test_stream_writes_store_and_deanonymize(self):
+        anonymize_stream(io.StringIO("SELECT name, age FROM user WHERE age > 1;"), io.StringIO(),
+                         "sql", mapping_store=self.store)
+        hashed_name = hashlib.sha256("name".encode()).hexdigest()
+        hashed_age = hashlib.sha256("age".encode()).hexdigest()
+        self.assertEqual(self.store.lookup("name"), hashed_name)
+        anonymized = "SELECT %s, %s FROM user WHERE %s > 1" % (hashed_name, hashed_age, hashed_age)
+        self.assertEqual(deanonymize_query(anonymized, self.store),
+                         "SELECT name, age FROM user WHERE age > 1")
+
+    def test_refuses_other_digest_settings(self):
+        self.store.insert_many({"name": hashlib.sha256(b"name").hexdigest()})
+        self.store.close()
+        configure_digests("base32")
+        with self.assertRaises(MappingStoreMismatchError) as raised:
+            MappingStore(self.path).insert_many({"age": "h2"})
+        self.assertIn("digest_encoding=hex (now base32)", str(raised.exception))
+        with self.assertRaises(SystemExit):
+            open_mapping_store(self.path)
+        configure_digests()
+        configure_hasher("hmac-sha256", key=b"secret")
+        with self.assertRaisesRegex(MappingStoreMismatchError, "hash key"):
+            MappingStore(self.path).lookup("name")
+        # Reading hashed names back does not depend on the settings
+        reader = MappingStore(self.path, readonly=True)
+        self.assertEqual(reader.lookup("name"), hashlib.sha256(b"name").hexdigest())
+        reader.close()
+
+    def test_checks_names_of_stores_without_settings(self):
+        self.store.connection.execute("DELETE FROM store_settings")
+        self.store.connection.execute("INSERT INTO column_mapping VALUES ('name', 'h1')")
+        self.store.connection.commit()
+        self.store.close()
+        with self.assertRaises(MappingStoreMismatchError):
+            MappingStore(self.path).lookup("name")
+
+
+if __name__ == '__main__':
+    unittest.main()
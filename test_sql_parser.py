@@ -1,7 +1,13 @@
 import unittest
 import hashlib
+import os
+import subprocess
+import sys
+from unittest import mock
 import sqlparse
-from sql_parser import is_select_statement, validate_sql_query, hash_column_names, parse_statement, map_original_hashed_column_name, modified_query
+import sqlvalidator
+from sql_cache import query_fingerprint_cache, validation_cache
+from sql_parser import ParsedQuery, precheck_query, is_select_statement, validate_sql_query, hash_column_names, parse_statement, map_original_hashed_column_name, modified_query
 
 
 class TestSQLParser(unittest.TestCase):
@@ -266,6 +272,67 @@ class TestSQLParser(unittest.TestCase):
         }
         self.assertEqual(column_name_mapping, expected_mapping)
 
+    def test_parse_statement_for_nested_functions(self):
+        # Test parsing of SQL statement
+        sql_query = "SELECT ROUND(SUM(price * quantity), 2) AS total, name AS customer FROM orders"
+        parsed = sqlparse.parse(sql_query)
+        column_name_mapping = {}
+        for statement in parsed:
+            parse_statement(statement, column_name_mapping, True)
+
+        expected_mapping = {
+            "price": hashlib.sha256("price".encode()).hexdigest(),
+            "quantity": hashlib.sha256("quantity".encode()).hexdigest(),
+            "name": hashlib.sha256("name".encode()).hexdigest(),
+        }
+        self.assertEqual(column_name_mapping, expected_mapping)
+
+    def test_parse_statement_for_deeply_nested_expression(self):
+        # Test parsing of SQL statement
+        sql_query = "SELECT " + "ABS(" * 40 + "price" + ")" * 40 + " FROM orders WHERE (status = 1 OR (region = 2 AND total > 3))"
+        parsed = sqlparse.parse(sql_query)
+        column_name_mapping = {}
+        for statement in parsed:
+            parse_statement(statement, column_name_mapping, True)
+
+        expected_mapping = {
+            "price": hashlib.sha256("price".encode()).hexdigest(),
+            "status": hashlib.sha256("status".encode()).hexdigest(),
+            "region": hashlib.sha256("region".encode()).hexdigest(),
+            "total": hashlib.sha256("total".encode()).hexdigest(),
+        }
+        self.assertEqual(column_name_mapping, expected_mapping)
+
+    def test_parse_statement_for_subqueries(self):
+        # Test parsing of SQL statement
+        sql_query = "SELECT a FROM (SELECT b FROM t1) d WHERE EXISTS (SELECT c FROM t2) AND e IN (SELECT g FROM t3)"
+        parsed = sqlparse.parse(sql_query)
+        column_name_mapping = {}
+        with mock.patch("sql_parser.sqlparse.parse") as parse:
+            for statement in parsed:
+                parse_statement(statement, column_name_mapping, True)
+        parse.assert_not_called()
+
+        expected_mapping = {
+            name: hashlib.sha256(name.encode()).hexdigest() for name in ["a", "b", "c", "e", "g"]
+        }
+        self.assertEqual(column_name_mapping, expected_mapping)
+
+    def test_parse_statement_for_cte(self):
+        # Test parsing of SQL statement
+        sql_query = "WITH recent AS (SELECT order_id FROM orders WHERE order_date > '2020-01-01') SELECT amount FROM recent"
+        parsed = sqlparse.parse(sql_query)
+        column_name_mapping = {}
+        for statement in parsed:
+            parse_statement(statement, column_name_mapping, True)
+
+        expected_mapping = {
+            "order_id": hashlib.sha256("order_id".encode()).hexdigest(),
+            "order_date": hashlib.sha256("order_date".encode()).hexdigest(),
+            "amount": hashlib.sha256("amount".encode()).hexdigest(),
+        }
+        self.assertEqual(column_name_mapping, expected_mapping)
+
     def test_map_original_hashed_column_name(self):
         original_column_name = "Country"
         column_name_mapping = {}
@@ -288,5 +355,125 @@ class TestSQLParser(unittest.TestCase):
         self.assertEqual(modified_sql, expected_modified_sql)
 
 
+class TestParsedQuery(unittest.TestCase):
+    def setUp(self):
+        query_fingerprint_cache.clear()
+        validation_cache.clear()
+
+    def test_parsed_query_parses_once(self):
+        sql_query = "SELECT COUNT(name), age FROM user WHERE age > 18"
+        with mock.patch("sql_parser.sqlparse.parse", wraps=sqlparse.parse) as parse:
+            parsed_query = ParsedQuery(sql_query)
+            self.assertTrue(parsed_query.is_select)
+            parsed_query.column_name_mapping
+            parsed_query.modified_sql
+        self.assertEqual(parse.call_count, 1)
+
+    def test_parsed_query_fast_path_skips_sqlparse(self):
+        sql_query = "UPDATE Customers SET ContactName='Alfred Schmidt', City='Frankfurt' WHERE CustomerID=1;"
+        with mock.patch("sql_parser.sqlparse.parse", wraps=sqlparse.parse) as parse:
+            parsed_query = ParsedQuery(sql_query)
+            self.assertEqual(parsed_query.statement_type, "UPDATE")
+            column_name_mapping = parsed_query.column_name_mapping
+        parse.assert_not_called()
+        self.assertEqual(column_name_mapping, ParsedQuery(sql_query, use_fast_path=False).column_name_mapping)
+
+    def test_parsed_query_matches_helpers(self):
+        sql_query = "SELECT name, age FROM user WHERE age > 18 And father_name = 'abc'"
+        parsed_query = ParsedQuery(sql_query)
+        self.assertEqual(parsed_query.is_select, is_select_statement(sql_query))
+        self.assertEqual(parsed_query.is_valid, validate_sql_query(sql_query))
+        self.assertEqual(parsed_query.column_name_mapping, hash_column_names(sql_query))
+        self.assertEqual(parsed_query.modified_sql, modified_query(
+            sql_query, hash_column_names(sql_query)))
+
+    def test_parsed_query_skips_validation_for_non_select(self):
+        sql_query = "DELETE FROM Customers WHERE CustomerName='Alfreds Futterkiste';"
+        with mock.patch("sql_parser.sqlvalidator.parse") as validate:
+            parsed_query = ParsedQuery(sql_query)
+            self.assertTrue(parsed_query.is_processable)
+        validate.assert_not_called()
+
+    def test_parsed_query_reuses_query_shape(self):
+        ParsedQuery("SELECT name FROM user WHERE age > 18").column_name_mapping
+        with mock.patch("sql_parser.sqlparse.parse", wraps=sqlparse.parse) as parse:
+            parsed_query = ParsedQuery("SELECT name FROM user WHERE age > 21")
+            self.assertTrue(parsed_query.is_select)
+            column_name_mapping = parsed_query.column_name_mapping
+        parse.assert_not_called()
+        self.assertEqual(column_name_mapping, {
+            "name": hashlib.sha256("name".encode()).hexdigest(),
+            "age": hashlib.sha256("age".encode()).hexdigest(),
+        })
+        self.assertEqual(query_fingerprint_cache.hits, 1)
+
+    def test_parsed_query_reuses_rewriter_of_shape(self):
+        first = ParsedQuery("SELECT name FROM user WHERE age > 18")
+        self.assertEqual(first.modified_sql, "SELECT %s FROM user WHERE %s > 18" % (
+            hashlib.sha256(b"name").hexdigest(), hashlib.sha256(b"age").hexdigest()))
+        with mock.patch("sql_parser.ColumnRewriter") as rewriter_class:
+            second = ParsedQuery("SELECT name FROM user WHERE age > 21")
+            self.assertEqual(second.modified_sql, "SELECT %s FROM user WHERE %s > 21" % (
+                hashlib.sha256(b"name").hexdigest(), hashlib.sha256(b"age").hexdigest()))
+        rewriter_class.assert_not_called()
+
+    def test_parsed_query_comment_does_not_share_shape(self):
+        ParsedQuery("SELECT a -- it's\n, salary FROM t WHERE c = 'x'").column_name_mapping
+        parsed_query = ParsedQuery("SELECT a -- it's\n, ssn FROM t WHERE c = 'x'")
+        self.assertIn("ssn", parsed_query.column_name_mapping)
+        self.assertNotIn("salary", parsed_query.column_name_mapping)
+        self.assertNotIn("ssn", parsed_query.modified_sql.split("--")[1])
+        first_mapping = ParsedQuery("SELECT `col 1` FROM t").column_name_mapping
+        self.assertNotEqual(ParsedQuery("SELECT `col 2` FROM t").column_name_mapping, first_mapping)
+
+    def test_parsed_query_reuses_validation_result(self):
+        with mock.patch("sql_parser.sqlvalidator.parse", wraps=sqlvalidator.parse) as validate:
+            self.assertTrue(ParsedQuery("SELECT name FROM user WHERE age > 18").is_valid)
+            self.assertTrue(ParsedQuery("SELECT name FROM user WHERE age > 18").is_valid)
+            self.assertTrue(ParsedQuery("SELECT name FROM user WHERE age > 21").is_valid)
+        self.assertEqual(validate.call_count, 2)
+        self.assertEqual(validation_cache.hits, 1)
+
+    def test_validation_cache_keeps_literals_apart(self):
+        # sqlvalidator's answer depends on the literal values, not only the shape
+        for valid_query, invalid_query in [
+                ("SELECT a FROM t ORDER BY 1", "SELECT a FROM t ORDER BY 2"),
+                ("SELECT a FROM t LIMIT 10", "SELECT a FROM t LIMIT 'x'"),
+                ("SELECT a FROM t GROUP BY 'x'", "SELECT a FROM t GROUP BY 5")]:
+            for first, second in [(valid_query, invalid_query), (invalid_query, valid_query)]:
+                validation_cache.clear()
+                validate_sql_query(first)
+                self.assertEqual(validate_sql_query(second), second == valid_query)
+
+    def test_validation_cache_separates_queries_behind_comments(self):
+        self.assertTrue(ParsedQuery("SELECT a -- it's\n, b FROM t WHERE c = 'x'").is_valid)
+        broken_query = "SELECT a -- it's\n, , FROM WHERE c = 'x'"
+        self.assertFalse(ParsedQuery(broken_query, use_cache=False).is_valid)
+        self.assertFalse(ParsedQuery(broken_query).is_valid)
+
+    def test_precheck_rejects_broken_queries(self):
+        self.assertTrue(precheck_query("SELECT a FROM t WHERE b = 'it''s (' AND (c = 1) -- )"))
+        for sql_query in ["SELECT `a(` FROM t", "SELECT `it's`, `a\"` FROM t"]:
+            self.assertTrue(precheck_query(sql_query))
+            self.assertTrue(ParsedQuery(sql_query).is_valid)
+        for sql_query in ["SELECT a FROM t WHERE (b = 1", "SELECT a FROM t WHERE b = 'x",
+                          "SELECT * FROM WHERE column1 = 'value';", "SELECT a FROM"]:
+            with mock.patch("sql_parser.sqlvalidator.parse") as validate:
+                self.assertFalse(precheck_query(sql_query))
+                self.assertFalse(ParsedQuery(sql_query).is_valid)
+            validate.assert_not_called()
+
+    def test_import_does_not_load_heavy_dependencies(self):
+        code = ("import sys, sql_parser; "
+                "print(sorted(name for name in ('sqlparse.sql', 'sqlvalidator.grammar', 'sql_splitter') if name in sys.modules))")
+        output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+        self.assertEqual(output.stdout.strip(), "[]")
+
+    def test_parsed_query_invalid_select(self):
+        parsed_query = ParsedQuery("SELECT * FROM WHERE column1 = 'value';")
+        self.assertFalse(parsed_query.is_processable)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+import hashlib
+import re
+import sqlparse
+from sql_parser import ParsedQuery
+from sql_rewriter import ColumnRewriter, rewrite_statements
+
+
+def regex_modified_query(sql_query, column_name_mapping):
+    # The single-alternation rewrite the rewriter replaces
+    column_pattern = re.compile(r'\b(' + '|'.join(re.escape(key) for key in column_name_mapping.keys()) + r')\b')
+    return column_pattern.sub(lambda match: column_name_mapping[match.group(0)], sql_query)
+
+
+class TestColumnRewriter(unittest.TestCase):
+    def test_rewrite_matches_regex_rewrite(self):
+        sql_query = "SELECT Orders.OrderID, OrderIDs, COUNT(CustomerID) FROM Orders WHERE OrderID=1 AND Country<>'x'"
+        mapping = {
+            "OrderID": hashlib.sha256("OrderID".encode()).hexdigest(),
+            "CustomerID": hashlib.sha256("CustomerID".encode()).hexdigest(),
+            "Country": hashlib.sha256("Country".encode()).hexdigest(),
+        }
+        self.assertEqual(ColumnRewriter(mapping).rewrite(sql_query),
+                         regex_modified_query(sql_query, mapping))
+
+    def test_rewrite_non_word_column_names(self):
+        sql_query = "SELECT a*b, * FROM t WHERE my col = 1"
+        mapping = {"*": "star", "my col": "hashed", "a": "x"}
+        self.assertEqual(ColumnRewriter(mapping).rewrite(sql_query),
+                         regex_modified_query(sql_query, mapping))
+
+    def test_add_word_column_does_not_recompile(self):
+        rewriter = ColumnRewriter({"name": "n"})
+        rewriter.add("age", "a")
+        self.assertEqual(rewriter.version, 0)
+        rewriter.add("*", "s")
+        self.assertEqual(rewriter.version, 1)
+        self.assertEqual(rewriter.rewrite("SELECT name, age FROM t"), "SELECT n, a FROM t")
+
+    def test_rewrite_empty_mapping(self):
+        self.assertEqual(ColumnRewriter().rewrite("SELECT 1"), "SELECT 1")
+
+
+class TestRewriteStatements(unittest.TestCase):
+    def test_rewrite_statements_skips_literals_and_tables(self):
+        sql_query = "SELECT name, Orders.OrderID FROM Orders o JOIN name n ON o.id = n.id WHERE name = 'name' GROUP BY name"
+        mapping = {"name": "H", "OrderID": "O", "id": "I"}
+        self.assertEqual(rewrite_statements(sqlparse.parse(sql_query), mapping),
+                         "SELECT H, Orders.O FROM Orders o JOIN name n ON o.I = n.I WHERE H = 'name' GROUP BY H")
+
+    def test_rewrite_statements_insert_and_update(self):
+        mapping = {"city": "C", "zip": "Z"}
+        self.assertEqual(rewrite_statements(sqlparse.parse("INSERT INTO city (city, zip) VALUES (1, 2)"), mapping),
+                         "INSERT INTO city (C, Z) VALUES (1, 2)")
+        self.assertEqual(rewrite_statements(sqlparse.parse("UPDATE city SET city = 'city' WHERE \"zip\" = 1"), mapping),
+                         "UPDATE city SET C = 'city' WHERE \"Z\" = 1")
+
+    def test_parsed_query_token_rewrite_mode(self):
+        sql_query = "SELECT COUNT(CustomerID), Country FROM Customers GROUP BY Country HAVING COUNT(CustomerID) > 5;"
+        parsed_query = ParsedQuery(sql_query, rewrite_mode="tokens")
+        self.assertEqual(parsed_query.modified_sql, ParsedQuery(sql_query).modified_sql)
+
+    def test_parsed_query_unknown_rewrite_mode(self):
+        with self.assertRaises(ValueError):
+            ParsedQuery("SELECT 1", rewrite_mode="text")
+
+
+if __name__ == "__main__":
+    unittest.main()
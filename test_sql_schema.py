@@ -0,0 +1,138 @@
+import unittest
+import hashlib
+import io
+import json
+import os
+import tempfile
+from sql_hashing import ColumnMapping
+from sql_parser import ParsedQuery, hash_column_names, main
+from sql_schema import Schema, configure_schema, parse_ddl
+from sql_stream import anonymize_stream, init_worker
+
+DDL = """
+-- Users of the shop
+CREATE TABLE IF NOT EXISTS public.users (
+    id integer PRIMARY KEY,
+    name varchar(100) NOT NULL, -- display name
+    "First Name" text,
+    balance numeric(10, 2) DEFAULT 0,
+    CONSTRAINT users_name_unique UNIQUE (name)
+);
+CREATE INDEX users_name ON users (name);
+CREATE TEMPORARY TABLE orders (order_id int, user_id int, total numeric(8,2),
+    PRIMARY KEY (order_id), FOREIGN KEY (user_id) REFERENCES users (id));
+"""
+
+
+def sha256(name):
+    return hashlib.sha256(name.encode()).hexdigest()
+
+
+class TestSchema(unittest.TestCase):
+    def tearDown(self):
+        configure_schema()
+
+    def test_parse_ddl(self):
+        self.assertEqual(parse_ddl(DDL), {
+            "public.users": ["id", "name", "First Name", "balance"],
+            "orders": ["order_id", "user_id", "total"],
+        })
+
+    def test_anonymize_known_columns_only(self):
+        schema = Schema(parse_ddl(DDL))
+        self.assertEqual(len(schema), 7)
+        modified_sql, column_name_mapping = schema.anonymize(
+            "SELECT u.name, o.total FROM users u JOIN orders o ON u.id = o.user_id")
+        self.assertEqual(column_name_mapping, {
+            "name": sha256("name"), "total": sha256("total"),
+            "id": sha256("id"), "user_id": sha256("user_id"),
+        })
+        self.assertEqual(modified_sql, "SELECT u.%s, o.%s FROM users u JOIN orders o ON u.%s = o.%s" % (
+            sha256("name"), sha256("total"), sha256("id"), sha256("user_id")))
+        self.assertEqual(schema.lookup('SELECT "First Name" FROM users'),
+                         {"First Name": sha256("First Name")})
+
+    def test_unquoted_names_are_case_insensitive(self):
+        schema = Schema(parse_ddl("CREATE TABLE Customers (CustomerID int, CustomerName text, Email text);"))
+        modified_sql, column_name_mapping = schema.anonymize(
+            'SELECT customername, EMAIL, "email" FROM customers WHERE CUSTOMERID = 1')
+        # The mapping holds the DDL spelling, the one the hash is computed from
+        self.assertEqual(column_name_mapping, {
+            "CustomerName": sha256("CustomerName"), "Email": sha256("Email"),
+            "CustomerID": sha256("CustomerID"),
+        })
+        # So --mapping-output writes the hashes the SQL holds
+        self.assertEqual(ColumnMapping(column_name_mapping).to_dict(), column_name_mapping)
+        # Quoted names are compared as they are written
+        self.assertEqual(modified_sql, 'SELECT %s, %s, "email" FROM customers WHERE %s = 1' % (
+            sha256("CustomerName"), sha256("Email"), sha256("CustomerID")))
+
+    def test_literals_comments_tables_and_aliases_are_kept(self):
+        schema = Schema(parse_ddl(
+            "CREATE TABLE Customers (id int, CustomerID int, name text);"
+            "CREATE TABLE Orders (id int, CustomerID int, total int);"))
+        sql_query = ("SELECT o.total AS name, 'id' -- id of the order\n"
+                     "FROM Orders o JOIN Customers id ON id.CustomerID = o.CustomerID /* name */ "
+                     "WHERE o.id = 'name'")
+        modified_sql, column_name_mapping = schema.anonymize(sql_query)
+        self.assertEqual(column_name_mapping, {
+            "total": sha256("total"), "CustomerID": sha256("CustomerID"), "id": sha256("id")})
+        self.assertEqual(modified_sql,
+                         "SELECT o.%s AS name, 'id' -- id of the order\n"
+                         "FROM Orders o JOIN Customers id ON id.%s = o.%s /* name */ "
+                         "WHERE o.%s = 'name'" % (
+                             sha256("total"), sha256("CustomerID"), sha256("CustomerID"), sha256("id")))
+        self.assertEqual(schema.lookup("SELECT 1 FROM Customers AS name, Orders id WHERE name.id = id.id"),
+                         {"id": sha256("id")})
+
+    def test_functions_and_keywords_are_kept(self):
+        schema = Schema(parse_ddl("CREATE TABLE events (id int, count int, date date, year int, created date);"))
+        sql_query = ("SELECT COUNT(*), date(created), EXTRACT(YEAR FROM created), count, year, "
+                     "DATE '2024-01-01', created + INTERVAL 1 YEAR, created::date "
+                     "FROM events WHERE EXISTS (SELECT 1 FROM events) AND SUBSTRING(date FROM 1 FOR 4) = '2024'")
+        modified_sql, column_name_mapping = schema.anonymize(sql_query)
+        self.assertEqual(sorted(column_name_mapping), ["count", "created", "date", "year"])
+        self.assertEqual(modified_sql, (
+            "SELECT COUNT(*), date({created}), EXTRACT(YEAR FROM {created}), {count}, {year}, "
+            "DATE '2024-01-01', {created} + INTERVAL 1 YEAR, {created}::date "
+            "FROM events WHERE EXISTS (SELECT 1 FROM events) AND SUBSTRING({date} FROM 1 FOR 4) = '2024'"
+        ).format(**{name: sha256(name) for name in column_name_mapping}))
+
+    def test_parsed_query_uses_configured_schema(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "schema.sql")
+            with open(path, "w", encoding="utf-8") as ddl_file:
+                ddl_file.write(DDL)
+            configure_schema(path)
+            self.assertEqual(hash_column_names("SELECT name, total FROM users WHERE id = 1"), {
+                "name": sha256("name"), "total": sha256("total"), "id": sha256("id")})
+            parsed_query = ParsedQuery("UPDATE users SET balance = 0 WHERE name = 'x'")
+            self.assertEqual(parsed_query.modified_sql, "UPDATE users SET %s = 0 WHERE %s = 'x'" % (
+                sha256("balance"), sha256("name")))
+            tokens_query = ParsedQuery("SELECT name FROM users WHERE name = 'name'", rewrite_mode="tokens")
+            self.assertEqual(tokens_query.modified_sql,
+                             "SELECT %s FROM users WHERE %s = 'name'" % (sha256("name"), sha256("name")))
+            tokens_query = ParsedQuery("SELECT NAME FROM users", rewrite_mode="tokens")
+            self.assertEqual(tokens_query.column_name_mapping, {"name": sha256("name")})
+            self.assertEqual(tokens_query.modified_sql, "SELECT %s FROM users" % sha256("name"))
+
+            # Worker processes load the schema themselves
+            configure_schema()
+            output = io.StringIO()
+            anonymize_stream(io.StringIO("SELECT name, nickname FROM users; SELECT total FROM orders;"), output,
+                             "sql", batch_size=1, workers=2, initializer=init_worker,
+                             initargs=(100, 100, None, False, 100, "hex", None, "sha256", None, None, path))
+            results = [json.loads(line) for line in output.getvalue().splitlines()]
+            self.assertEqual([result["column_name_mapping"] for result in results],
+                             [{"name": sha256("name")}, {"total": sha256("total")}])
+
+    def test_missing_schema_exits_cleanly(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with self.assertRaises(SystemExit) as raised:
+                main(["--schema", os.path.join(directory, "missing.sql"), "--input", "-"])
+        self.assertIn("cannot read --schema", str(raised.exception))
+        self.assertIn("missing.sql", str(raised.exception))
+
+
+if __name__ == '__main__':
+    unittest.main()
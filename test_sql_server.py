@@ -0,0 +1,114 @@
+import unittest
+import asyncio
+import hashlib
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from sql_server import AnonymizerServer
+
+
+async def _request_lines(server, lines):
+    host, port = server.address[:2]
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write("".join(line + "\n" for line in lines).encode())
+    await writer.drain()
+    writer.write_eof()
+    responses = [json.loads(line) for line in (await reader.read()).decode().splitlines()]
+    writer.close()
+    return responses
+
+
+class TestAnonymizerServer(unittest.TestCase):
+    def run_with_server(self, client, **options):
+        async def run():
+            server = AnonymizerServer(**options)
+            await server.start()
+            try:
+                return server, await client(server)
+            finally:
+                await server.close()
+        return asyncio.run(run())
+
+    def test_answers_in_request_order(self):
+        lines = ["SELECT column_%d FROM t" % index for index in range(10)]
+        lines.append('{"request_id": "r1", "query": "SELECT * FROM WHERE a = 1"}')
+        server, responses = self.run_with_server(
+            lambda server: _request_lines(server, lines), batch_size=4, max_in_flight=2)
+        self.assertEqual(len(responses), 11)
+        for index, response in enumerate(responses[:10]):
+            hashed_name = hashlib.sha256(("column_%d" % index).encode()).hexdigest()
+            self.assertEqual(response["query"], "SELECT " + hashed_name + " FROM t")
+        self.assertEqual(responses[10], {"request_id": "r1", "query": None,
+                                         "column_name_mapping": {}, "valid": False})
+
+    def test_batches_concurrent_connections(self):
+        async def clients(server):
+            return await asyncio.gather(*[
+                _request_lines(server, ["SELECT name FROM user"]) for _ in range(8)])
+
+        server, responses = self.run_with_server(clients, batch_size=8, batch_latency=0.05)
+        self.assertEqual(len(responses), 8)
+        self.assertTrue(all(response[0]["valid"] for response in responses))
+        self.assertEqual(server.requests, 8)
+        self.assertLess(server.batches, 8)
+
+    def test_answers_oversize_lines_with_an_error(self):
+        long_query = "SELECT " + ", ".join("column_%d" % index for index in range(8000)) + " FROM t"
+        lines = ["SELECT a FROM t", long_query, "SELECT b FROM t", long_query]
+        server, responses = self.run_with_server(
+            lambda server: _request_lines(server, lines), max_request_size=1024)
+        self.assertEqual(len(responses), 4)
+        self.assertEqual([response["valid"] for response in responses], [True, False, True, False])
+        self.assertEqual(responses[1], {"error": "Request longer than 1024 bytes", "valid": False})
+        self.assertEqual(list(responses[2]["column_name_mapping"]), ["b"])
+
+    def test_stops_when_the_sender_has_stopped(self):
+        async def run():
+            responses = asyncio.Queue(1)
+            responses.put_nowait("answered")
+            sender = asyncio.ensure_future(asyncio.sleep(0))
+            await sender
+            # A full queue nobody takes from does not block the connection
+            return await AnonymizerServer._put_response(responses, None, sender)
+
+        self.assertFalse(asyncio.run(run()))
+
+    def test_stops_reading_when_the_queue_is_full(self):
+        # The only executor thread waits on gate, so the first batch holds
+        # the batch slot, the batcher holds the second request and the
+        # queue fills up with max_pending more
+        gate = threading.Event()
+        executor = ThreadPoolExecutor(max_workers=1)
+        executor.submit(gate.wait)
+        read_lines = []
+
+        class CountingServer(AnonymizerServer):
+            def _parse_request(self, line):
+                read_lines.append(line)
+                return super()._parse_request(line)
+
+        async def run():
+            server = CountingServer(batch_size=1, max_pending=2, executor=executor)
+            await server.start()
+            try:
+                lines = ["SELECT column_%d FROM t" % index for index in range(20)]
+                client = asyncio.ensure_future(_request_lines(server, lines))
+                await asyncio.sleep(0.2)
+                self.assertTrue(server._queue.full())
+                # Two queued, one held by the batcher, one running and one waiting for room
+                self.assertEqual(len(read_lines), 5)
+                gate.set()
+                return await client
+            finally:
+                gate.set()
+                await server.close()
+
+        responses = asyncio.run(run())
+        self.assertEqual(len(read_lines), 20)
+        self.assertEqual([response["column_name_mapping"] for response in responses],
+                         [{"column_%d" % index: hashlib.sha256(("column_%d" % index).encode()).hexdigest()}
+                          for index in range(20)])
+
+
+if __name__ == '__main__':
+    unittest.main()
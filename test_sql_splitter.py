@@ -0,0 +1,62 @@
+import unittest
+import os
+import tempfile
+from sql_splitter import is_mappable, split_sql_file, split_sql_statements
+from sql_stream import iter_sql_records
+
+SCRIPT = r"""-- Dump header; not a statement
+/* generated; by a tool */
+SELECT name FROM user WHERE city = 'it''s; here';
+INSERT INTO t VALUES ('it\'s; x', 'dir\\', '\\\'; z');
+INSERT INTO `weird;table` ("a;b") VALUES (1);
+CREATE FUNCTION f() RETURNS int AS $$ SELECT 1; $$ LANGUAGE sql;
+CREATE FUNCTION g() RETURNS int AS $body$ SELECT '$$'; $body$ LANGUAGE sql;
+SELECT a$b FROM t -- trailing; comment
+WHERE x = 1 /* inline; */;
+SELECT $1 FROM t;
+DELETE FROM t
+-- only a comment at the end;"""
+
+STATEMENTS = [
+    "SELECT name FROM user WHERE city = 'it''s; here'",
+    r"INSERT INTO t VALUES ('it\'s; x', 'dir\\', '\\\'; z')",
+    "INSERT INTO `weird;table` (\"a;b\") VALUES (1)",
+    "CREATE FUNCTION f() RETURNS int AS $$ SELECT 1; $$ LANGUAGE sql",
+    "CREATE FUNCTION g() RETURNS int AS $body$ SELECT '$$'; $body$ LANGUAGE sql",
+    "SELECT a$b FROM t -- trailing; comment\nWHERE x = 1 /* inline; */",
+    "SELECT $1 FROM t",
+    "DELETE FROM t\n-- only a comment at the end;",
+]
+
+
+class TestSplitter(unittest.TestCase):
+    def test_quotes_comments_and_dollar_quotes(self):
+        self.assertEqual(list(split_sql_statements([SCRIPT])), STATEMENTS)
+
+    def test_any_chunk_size(self):
+        # Tokens cut in two by a chunk boundary ('--', '/*', '$body$', ...)
+        for size in range(1, 12):
+            chunks = [SCRIPT[index:index + size] for index in range(0, len(SCRIPT), size)]
+            self.assertEqual(list(split_sql_statements(chunks)), STATEMENTS, size)
+
+    def test_mapped_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "dump.sql")
+            with open(path, "w", encoding="utf-8", newline="\r\n") as sql_file:
+                sql_file.write(SCRIPT + "\nSELECT 'café' FROM t")
+            with open(path, "r", encoding="utf-8") as sql_file:
+                self.assertTrue(is_mappable(sql_file))
+                self.assertEqual(list(split_sql_file(sql_file)), STATEMENTS[:-1] + [
+                    "DELETE FROM t\n-- only a comment at the end;\nSELECT 'café' FROM t"])
+                sql_file.seek(0)
+                records = list(iter_sql_records(sql_file))
+            self.assertEqual(len(records), len(STATEMENTS))
+            empty_path = os.path.join(directory, "empty.sql")
+            open(empty_path, "w").close()
+            with open(empty_path, "r", encoding="utf-8") as sql_file:
+                self.assertFalse(is_mappable(sql_file))
+                self.assertEqual(list(iter_sql_records(sql_file)), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import unittest
+from sql_cache import query_fingerprint_cache, validation_cache
+from sql_parser import ParsedQuery
+from sql_stats import STATS, Stats
+
+
+class TestStats(unittest.TestCase):
+    def setUp(self):
+        query_fingerprint_cache.clear()
+        validation_cache.clear()
+        STATS.reset()
+
+    def tearDown(self):
+        STATS.disable()
+        STATS.reset()
+
+    def test_disabled_stats_record_nothing(self):
+        with STATS.query():
+            ParsedQuery("SELECT name FROM user").modified_sql
+        self.assertEqual(STATS.snapshot(), {"counters": {}, "timers": {}})
+
+    def test_enabled_stats_record_stages(self):
+        STATS.enable()
+        with STATS.query():
+            parsed_query = ParsedQuery("SELECT name, age FROM user WHERE age > 18", use_fast_path=False)
+            self.assertTrue(parsed_query.is_processable)
+            parsed_query.modified_sql
+        snapshot = STATS.snapshot()
+        for stage in ("query", "tokenize", "validate", "walk", "rewrite"):
+            self.assertEqual(snapshot["timers"][stage]["count"], 1)
+        self.assertEqual(snapshot["counters"]["queries"], 1)
+        self.assertEqual(snapshot["counters"]["fingerprint_cache_misses"], 1)
+        self.assertGreater(snapshot["counters"]["tokens_visited"], 0)
+
+    def test_merge_snapshot(self):
+        worker_stats = Stats()
+        worker_stats.enable()
+        worker_stats.incr("queries", 3)
+        worker_stats.record("walk", 0.001)
+        STATS.enable()
+        STATS.incr("queries")
+        STATS.merge(worker_stats.snapshot(reset=True))
+        snapshot = STATS.snapshot()
+        self.assertEqual(snapshot["counters"]["queries"], 4)
+        self.assertEqual(snapshot["timers"]["walk"]["count"], 1)
+        self.assertEqual(worker_stats.snapshot()["counters"], {})
+        self.assertIn("walk", STATS.summary())
+
+
+if __name__ == "__main__":
+    unittest.main()
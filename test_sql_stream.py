@@ -0,0 +1,81 @@
+import unittest
+import hashlib
+import io
+import json
+from sql_stream import split_sql_statements, iter_jsonl_records, anonymize_batches, anonymize_stream, serve_lines
+
+
+class TestSQLStream(unittest.TestCase):
+    def test_split_sql_statements(self):
+        sql_text = "SELECT name FROM user; UPDATE Customers SET City='a;b' WHERE CustomerID=1;\nDELETE FROM t"
+        statements = list(split_sql_statements([sql_text]))
+        self.assertEqual(statements, [
+            "SELECT name FROM user",
+            "UPDATE Customers SET City='a;b' WHERE CustomerID=1",
+            "DELETE FROM t",
+        ])
+
+    def test_split_sql_statements_across_chunks(self):
+        sql_text = "SELECT name FROM user WHERE city = 'it''s; here'; SELECT age FROM user;"
+        chunks = [sql_text[index:index + 3] for index in range(0, len(sql_text), 3)]
+        self.assertEqual(list(split_sql_statements(chunks)), [
+            "SELECT name FROM user WHERE city = 'it''s; here'",
+            "SELECT age FROM user",
+        ])
+
+    def test_iter_jsonl_records(self):
+        stream = io.StringIO('{"id": 1, "sql": "SELECT name FROM user"}\n\nnot json\n')
+        records = list(iter_jsonl_records(stream, "sql"))
+        self.assertEqual(records, [
+            ({"id": 1, "sql": "SELECT name FROM user"}, "SELECT name FROM user"),
+            ({}, None),
+        ])
+
+    def test_anonymize_stream_sql(self):
+        output = io.StringIO()
+        count = anonymize_stream(io.StringIO("SELECT name FROM user; SELECT * FROM WHERE a = 1;"),
+                                 output, "sql", batch_size=1)
+        results = [json.loads(line) for line in output.getvalue().splitlines()]
+        hashed_name = hashlib.sha256("name".encode()).hexdigest()
+        self.assertEqual(count, 2)
+        self.assertEqual(results[0], {
+            "query": "SELECT " + hashed_name + " FROM user",
+            "column_name_mapping": {"name": hashed_name},
+            "valid": True,
+        })
+        self.assertEqual(results[1], {"query": None, "column_name_mapping": {}, "valid": False})
+
+    def test_anonymize_stream_jsonl(self):
+        output = io.StringIO()
+        anonymize_stream(io.StringIO('{"request_id": "r1", "body": "DELETE FROM t WHERE age = 1"}\n'),
+                         output, "jsonl", query_field="body")
+        result = json.loads(output.getvalue())
+        hashed_age = hashlib.sha256("age".encode()).hexdigest()
+        self.assertEqual(result["request_id"], "r1")
+        self.assertEqual(result["body"], "DELETE FROM t WHERE " + hashed_age + " = 1")
+        self.assertTrue(result["valid"])
+
+    def test_anonymize_batches_parallel_keeps_order(self):
+        queries = ["SELECT column_%d FROM t" % index for index in range(20)]
+        records = [({"index": index}, sql_query) for index, sql_query in enumerate(queries)]
+        column_name_mapping = {}
+        results = list(anonymize_batches(records, batch_size=3, workers=2,
+                                         column_name_mapping=column_name_mapping))
+        self.assertEqual([result["index"] for result in results], list(range(20)))
+        self.assertEqual(column_name_mapping, {
+            "column_%d" % index: hashlib.sha256(("column_%d" % index).encode()).hexdigest()
+            for index in range(20)
+        })
+
+    def test_serve_lines(self):
+        output = io.StringIO()
+        count = serve_lines(io.StringIO('SELECT name FROM user\n\n{"id": 7, "query": "SELECT age FROM user"}\n'), output)
+        results = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual(count, 2)
+        self.assertEqual(results[0]["column_name_mapping"], {"name": hashlib.sha256("name".encode()).hexdigest()})
+        self.assertEqual(results[1]["id"], 7)
+        self.assertEqual(results[1]["column_name_mapping"], {"age": hashlib.sha256("age".encode()).hexdigest()})
+
+
+if __name__ == "__main__":
+    unittest.main()